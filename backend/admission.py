@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+
+# 上传请求体的大小上限 (默认为 200 MB)
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# 每个客户端的令牌桶：每秒补充的请求数与允许的突发请求数
+CLIENT_RATE_PER_SECOND = 2.0
+CLIENT_BURST = 20
+# 令牌桶数量超过该值时清理已补满的桶，避免大量不同客户端占用内存
+CLIENT_BUCKETS_PRUNE_SIZE = 10000
+# 调度器的老化速度：文件每大 1 个单位，优先级相当于晚到 1/该值 秒；
+# 默认 10 MB/s，即 100 MB 的文件排在 10 秒内到达的小文件之后，等待超过 10 秒后不再被插队
+SCHEDULER_AGING_BYTES_PER_SECOND = 10 * 1024 * 1024
+
+
+class TokenBucketLimiter:
+    """
+    按客户端区分的令牌桶限流
+    """
+    def __init__(self, rate=CLIENT_RATE_PER_SECOND, burst=CLIENT_BURST):
+        self.rate = rate
+        self.burst = burst
+        # 客户端 -> (令牌数, 上次补充时间)
+        self._buckets = {}
+
+    def acquire(self, client, tokens=1):
+        """
+        尝试取出令牌
+
+        返回:
+            0 表示放行，否则为需要等待的秒数
+        """
+        now = time.monotonic()
+        available, updated = self._buckets.get(client, (self.burst, now))
+        available = min(self.burst, available + (now - updated) * self.rate)
+        if available >= tokens:
+            self._buckets[client] = (available - tokens, now)
+            if len(self._buckets) > CLIENT_BUCKETS_PRUNE_SIZE:
+                self._prune(now)
+            return 0
+        self._buckets[client] = (available, now)
+        return (tokens - available) / self.rate
+
+    def _prune(self, now):
+        """
+        删除已补满的桶，它们与新客户端的初始状态相同
+        """
+        self._buckets = {
+            client: (available, updated)
+            for client, (available, updated) in self._buckets.items()
+            if available + (now - updated) * self.rate < self.burst
+        }
+
+    def stats(self):
+        return {"clients": len(self._buckets), "rate": self.rate, "burst": self.burst}
+
+
+class WeightedScheduler:
+    """
+    限制同时进行的解析数，排队时小文件优先，并按等待时间老化，大文件不会一直被插队
+
+    优先级 = 到达时间 + 文件大小 / aging_bytes_per_second，数值小的先执行。
+    只在单个事件循环中使用，不需要加锁。
+    """
+    def __init__(self, concurrency, aging_bytes_per_second=SCHEDULER_AGING_BYTES_PER_SECOND):
+        self.concurrency = concurrency
+        self.aging_bytes_per_second = aging_bytes_per_second
+        self._available = concurrency
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, size):
+        """
+        等待一个执行名额
+
+        返回:
+            排队等待的秒数
+        """
+        start = time.monotonic()
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        priority = start + size / self.aging_bytes_per_second
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 名额已经移交给该请求但请求被取消时，转交给下一个等待者
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return time.monotonic() - start
+
+    def release(self):
+        """
+        归还名额，直接移交给优先级最高的等待者
+        """
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._available += 1
+
+    @asynccontextmanager
+    async def slot(self, size):
+        """
+        用法:
+            async with scheduler.slot(file_size) as waited:
+                ...
+        """
+        waited = await self.acquire(size)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self.concurrency - self._available,
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+        }
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+async def _send_error(send, status, detail, headers=None):
+    """
+    直接发送 JSON 错误响应，格式与 HTTPException 一致
+    """
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    for name, value in (headers or {}).items():
+        response_headers.append((name.encode(), value.encode()))
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _client_host(scope):
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    """
+    上传接口的准入控制（ASGI 中间件），在请求体写入磁盘之前执行
+
+    - Content-Length 超过上限时直接返回 413，不读取请求体
+    - 没有 Content-Length（分块传输）时边接收边计数，超过上限即中止并返回 413
+    - 每个客户端一个令牌桶，超出速率时返回 429 和 Retry-After
+    """
+    def __init__(self, app, paths=("/upload",), max_body_bytes=MAX_UPLOAD_BYTES,
+                 rate=CLIENT_RATE_PER_SECOND, burst=CLIENT_BURST, client_key=_client_host):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_body_bytes = max_body_bytes
+        self.limiter = TokenBucketLimiter(rate, burst)
+        self.client_key = client_key
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        too_large_detail = f"上传内容超过大小限制 ({self.max_body_bytes / 1024 / 1024:.1f} MB)"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await _send_error(send, 413, too_large_detail)
+            return
+
+        retry_after = self.limiter.acquire(self.client_key(scope))
+        if retry_after:
+            await _send_error(send, 429, "请求过于频繁，请稍后重试", {"retry-after": str(math.ceil(retry_after))})
+            return
+
+        received = 0
+        exceeded = False
+        responded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal responded
+            if exceeded:
+                # 请求体超限后应用返回的解析错误替换为 413
+                if not responded and message["type"] == "http.response.start":
+                    responded = True
+                    await _send_error(send, 413, too_large_detail)
+                return
+            if message["type"] == "http.response.start":
+                responded = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            if not responded:
+                await _send_error(send, 413, too_large_detail)
+
+    def stats(self):
+        return {"max_body_bytes": self.max_body_bytes, **self.limiter.stats()}
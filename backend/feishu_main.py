@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import hashlib
 import requests
 import tempfile
 import mimetypes
@@ -10,6 +11,13 @@ from urllib.parse import urlparse, unquote
 
 # 导入通用文件处理工具
 from utils.file_utils import get_file_content, read_all_files
+from utils.chunking import CHUNK_MAX_TOKENS, iter_chunks, iter_path_chunks
+from utils.singleflight import SingleFlight
+
+# 同一 URL 同时被多次请求时只下载和解析一次
+_url_flight = SingleFlight()
+# 不同 URL 指向相同内容（如带不同签名的飞书附件链接）时只解析一次
+_content_flight = SingleFlight()
 
 # ==========================================
 # 飞书工作流专用逻辑
@@ -18,6 +26,8 @@ from utils.file_utils import get_file_content, read_all_files
 def extract_content_from_url(url: str) -> str:
     """
     从URL下载文件并提取内容
+
+    并发的相同 URL 请求共享同一次下载和解析；下载后内容相同的文件共享同一次解析
     
     参数:
         url: 文件的网络地址
@@ -25,13 +35,23 @@ def extract_content_from_url(url: str) -> str:
     返回:
         提取的文件内容字符串
     """
-    try:
-        # 0. 清理URL (去除可能的反引号、引号、空格)
-        url = url.strip().strip('`').strip('"').strip("'").strip()
-        
-        if not url.startswith(('http://', 'https://')):
-            return f"错误: 无效的URL格式: {url}"
+    # 0. 清理URL (去除可能的反引号、引号、空格)
+    url = url.strip().strip('`').strip('"').strip("'").strip()
+    
+    if not url.startswith(('http://', 'https://')):
+        return f"错误: 无效的URL格式: {url}"
+
+    content, shared = _url_flight.do(url, _download_and_extract, url)
+    if shared:
+        print(f"与进行中的相同请求共享结果: {url}")
+    return content
 
+
+def _download_and_extract(url: str) -> str:
+    """
+    下载文件并提取内容，出错时返回错误信息
+    """
+    try:
         print(f"正在连接 URL: {url}")
         
         # 1. 发起请求，但不立即下载内容
@@ -100,10 +120,12 @@ def extract_content_from_url(url: str) -> str:
         print(f"正在下载文件...")
         print(f"保存位置: {local_file_path}")
         
+        digest = hashlib.blake2b(digest_size=32)
         with open(local_file_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 if chunk:
                     f.write(chunk)
+                    digest.update(chunk)
                     
         # 检查文件是否存在且不为空
         if not os.path.exists(local_file_path) or os.path.getsize(local_file_path) == 0:
@@ -111,7 +133,9 @@ def extract_content_from_url(url: str) -> str:
             
         # 5. 提取内容
         print("正在提取内容...")
-        content = get_file_content(local_file_path)
+        # 扩展名决定读取函数，一并作为合并的依据
+        key = (digest.hexdigest(), os.path.splitext(filename)[1].lower())
+        content, _ = _content_flight.do(key, get_file_content, local_file_path)
         
         # 6. 清理临时文件
         try:
@@ -128,16 +152,12 @@ def extract_content_from_url(url: str) -> str:
         return f"处理文件时发生错误: {str(e)}"
 
 
-def main(path):
+def parse_url_input(path):
     """
-    根据传入的文件或目录路径自动提取文字内容
-    
-    参数:
-        path: 文件路径、目录路径、URL或包含resourceURL的JSON字符串
-        
+    识别飞书传入的 URL 或包含 resourceURL 的 JSON 字符串
+
     返回:
-        如果是文件，返回文件内容字符串
-        如果是目录，返回包含所有文件内容的格式化字符串
+        识别出的 URL，不是 URL 输入时返回 None
     """
     # 1. 尝试处理 JSON 格式的输入 (飞书附件通常以 JSON 格式传递)
     try:
@@ -152,16 +172,33 @@ def main(path):
                     if isinstance(data, dict) and "resourceURL" in data:
                         url = data["resourceURL"]
                         print(f"检测到 JSON 输入，提取 URL: {url}")
-                        return extract_content_from_url(url)
+                        return url
                 except json.JSONDecodeError:
                     # 可能是非标准 JSON，尝试简单正则提取
                     pass
                     
             # 2. 尝试直接处理 URL
             if clean_path.startswith(('http://', 'https://')):
-                return extract_content_from_url(clean_path)
+                return clean_path
     except Exception as e:
         print(f"处理输入参数时发生警告: {e}")
+    return None
+
+
+def main(path):
+    """
+    根据传入的文件或目录路径自动提取文字内容
+    
+    参数:
+        path: 文件路径、目录路径、URL或包含resourceURL的JSON字符串
+        
+    返回:
+        如果是文件，返回文件内容字符串
+        如果是目录，返回包含所有文件内容的格式化字符串
+    """
+    url = parse_url_input(path)
+    if url:
+        return extract_content_from_url(url)
 
     # 3. 处理本地文件或目录
     path_obj = Path(path)
@@ -183,3 +220,28 @@ def main(path):
         return "\n".join(result)
     else:
         return f"错误: '{path}' 既不是文件也不是目录"
+
+
+def main_chunks(path, max_tokens=CHUNK_MAX_TOKENS, max_chars=None):
+    """
+    与 main 相同的输入，但按页/工作表/表格/段落边界切分为有 token 上限的分块，
+    供 LLM 节点逐块处理，避免整段内容超出上下文窗口
+    
+    参数:
+        path: 文件路径、目录路径、URL或包含resourceURL的JSON字符串
+        max_tokens: 每个分块的 token 上限（估算值）
+        max_chars: 每个分块的字符数上限，None 表示不限制
+        
+    返回:
+        分块列表，每项包含 source、sections、chunk_index、text、chars、tokens
+    """
+    url = parse_url_input(path)
+    if url:
+        content = extract_content_from_url(url)
+        return list(iter_chunks(content, source=url, max_tokens=max_tokens, max_chars=max_chars))
+
+    path_obj = Path(path)
+    if not path_obj.exists():
+        return list(iter_chunks(f"错误: 路径 '{path}' 不存在", source=str(path)))
+    # 目录下的文件逐个提取并分块，不先拼接成整体字符串
+    return list(iter_path_chunks(path_obj, max_tokens=max_tokens, max_chars=max_chars))
@@ -1,30 +1,48 @@
 import sys
 import os
+import argparse
+from functools import partial
 from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 导入通用文件处理工具
 from utils.file_utils import get_file_content, read_all_files
+from utils.sandbox import SandboxedExtractor, WarmWorkerPool
+from utils.search_index import SearchIndex
+from utils.dedupe import read_all_files_deduplicated, format_dedupe_report
+from utils.scanner import SCAN_WORKERS, SYMLINKS_FILES, SYMLINKS_FOLLOW
+from utils.batch_job import run_batch_job, format_batch_report
 
-def extract_content(path: str) -> str:
+def extract_content(path: str, extractor=None, dedupe=False, workers=1, **filters) -> str:
     """
     根据传入的文件或目录路径自动提取文字内容
     
     参数:
         path: 文件路径或目录路径
+        extractor: 提取单个文件内容的函数，默认为 get_file_content
+        dedupe: 目录中内容相同的文件是否只提取一次，并在末尾附上重复文件报告
+        workers: 目录中并行提取的文件数
+        filters: 目录扫描的过滤条件，见 utils.scanner.scan_files
         
     返回:
         如果是文件，返回文件内容字符串
         如果是目录，返回包含所有文件内容的格式化字符串
     """
+    if extractor is None:
+        extractor = get_file_content
+
     path_obj = Path(path)
     
     if not path_obj.exists():
         return f"错误: 路径 '{path}' 不存在"
     
     if path_obj.is_file():
-        return get_file_content(path_obj)
+        return extractor(path_obj)
     elif path_obj.is_dir():
-        file_contents = read_all_files(path)
+        report = None
+        if dedupe:
+            file_contents, report = read_all_files_deduplicated(path, extractor=extractor, workers=workers, **filters)
+        else:
+            file_contents = read_all_files(path, extractor=extractor, workers=workers, **filters)
         result = []
         for file_path, content in file_contents.items():
             result.append(f"\n{'='*80}")
@@ -32,6 +50,9 @@ def extract_content(path: str) -> str:
             result.append(f"{'='*80}")
             result.append(str(content))
             result.append(f"{'='*80}")
+        if report:
+            result.append("\n去重报告:")
+            result.append(format_dedupe_report(report))
         return "\n".join(result)
     else:
         return f"错误: '{path}' 既不是文件也不是目录"
@@ -41,11 +62,117 @@ def main():
     """
     主函数：演示如何使用 extract_content 函数
     """
-    if len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="提取文件或目录中的文字内容")
+    parser.add_argument("path", nargs="?", help="文件或目录路径，省略时交互式输入")
+    parser.add_argument("--isolated", action="store_true", help="在隔离的工作进程中处理每个文件，带超时和内存限制")
+    parser.add_argument("--timeout", type=float, default=None, help="隔离模式下单个文件的超时时间 (秒)")
+    parser.add_argument("--dedupe", action="store_true", help="目录中内容相同的文件只提取一次")
+    parser.add_argument("--workers", type=int, default=1, help="目录中并行提取的文件数，边扫描边提取")
+    parser.add_argument("--scan-workers", type=int, default=SCAN_WORKERS, help="并行扫描子目录的线程数，输出顺序不受影响")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="只处理匹配的文件，可重复指定")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", help="跳过匹配的文件和目录，可重复指定")
+    parser.add_argument("--max-depth", type=int, default=None, help="目录的最大遍历深度，0 表示只处理顶层文件")
+    parser.add_argument("--min-size", type=int, default=None, help="只处理不小于该大小的文件 (字节)")
+    parser.add_argument("--max-size", type=int, default=None, help="只处理不大于该大小的文件 (字节)")
+    parser.add_argument("--follow-symlinks", action="store_true", help="进入符号链接指向的目录")
+    parser.add_argument("--columnar-dir", metavar="DIR", help="表格文件的数据导出为该目录下的压缩列式文件，输出中只保留预览")
+    parser.add_argument("--output", metavar="FILE", help="以可续跑的批量任务运行，结果逐条写入 JSONL 文件，重新运行时跳过已完成的文件")
+    parser.add_argument("--retry-interrupted", action="store_true", help="批量任务重新提取上次中断时正在处理的文件")
+    parser.add_argument("--index", metavar="DB", help="增量更新指定的全文索引数据库，而不是输出内容")
+    parser.add_argument("--search", metavar="QUERY", help="在 --index 指定的索引中检索")
+    args = parser.parse_args()
+    if args.dedupe and args.output:
+        # 批量任务逐个文件记录结果以便续跑，不支持按内容合并重复文件
+        parser.error("--dedupe 不能与 --output 同时使用")
+
+    if args.index:
+        run_index(args)
+        return
+
+    filters = scan_filters(args)
+    # 读取选项传给每个文件的 get_file_content
+    options = {"columnar_dir": args.columnar_dir} if args.columnar_dir else {}
+    if args.isolated and args.workers > 1:
+        # 并行提取时每个文件交给进程池中的空闲工作进程
+        with WarmWorkerPool(size=args.workers, timeout=args.timeout) as pool:
+            dispatch(args, partial(pool.get_file_content, **options), filters)
+    elif args.isolated:
+        with SandboxedExtractor(timeout=args.timeout) as sandbox:
+            dispatch(args, partial(sandbox.get_file_content, **options), filters)
+    else:
+        dispatch(args, partial(get_file_content, **options), filters)
+
+
+def dispatch(args, extractor, filters):
+    """
+    按命令行参数运行批量任务或直接输出提取结果
+    """
+    if args.output:
+        target_path = args.path or "."
+        if not os.path.exists(target_path):
+            print(f"错误: 路径 '{target_path}' 不存在")
+            return
+        print(f"正在提取 '{target_path}' 的内容，结果写入 {args.output}...\n")
+        report = run_batch_job(
+            target_path, args.output, extractor=extractor, workers=args.workers,
+            retry_interrupted=args.retry_interrupted, **filters,
+        )
+        print(format_batch_report(report))
+    else:
+        run_extraction(args.path, extractor, args.dedupe, args.workers, filters)
+
+
+def scan_filters(args):
+    """
+    将命令行参数转换为目录扫描的过滤条件
+    """
+    return {
+        "include": args.include,
+        "exclude": args.exclude,
+        "max_depth": args.max_depth,
+        "min_size": args.min_size,
+        "max_size": args.max_size,
+        "symlinks": SYMLINKS_FOLLOW if args.follow_symlinks else SYMLINKS_FILES,
+        "scan_workers": args.scan_workers,
+    }
+
+
+def run_index(args):
+    """
+    增量更新全文索引，或在索引中检索
+    """
+    with SearchIndex(args.index) as index:
+        if args.search:
+            for hit in index.search(args.search):
+                print(f"{hit['path']}  {hit['section']}\n    {hit['snippet']}")
+            return
+
+        target_path = Path(args.path or ".")
+        if args.isolated:
+            with SandboxedExtractor(timeout=args.timeout) as sandbox:
+                stats = update_index(index, target_path, sandbox.get_file_content)
+        else:
+            stats = update_index(index, target_path, get_file_content)
+        print(f"索引更新完成: {stats}，当前索引 {index.stats()}")
+
+
+def update_index(index, target_path, extractor):
+    """
+    将文件或目录增量写入索引
+    """
+    if target_path.is_file():
+        return {"updated": int(index.update_file(target_path, extractor))}
+    return index.update_directory(target_path, extractor=extractor)
+
+
+def run_extraction(target_path, extractor, dedupe=False, workers=1, filters=None):
+    """
+    处理命令行提供的路径，未提供时交互式输入
+    """
+    if target_path:
         # 如果命令行提供了路径，则处理该路径
-        target_path = sys.argv[1]
         print(f"正在提取 '{target_path}' 的内容...\n")
-        print(extract_content(target_path))
+        print(extract_content(target_path, extractor, dedupe, workers, **(filters or {})))
     else:
         # 默认行为：交互式输入或处理当前目录
         print("请输入要提取内容的文件或目录路径 (直接回车默认处理当前目录):")
@@ -54,7 +181,7 @@ def main():
         target_path = user_input if user_input else "."
         
         print(f"\n正在提取 '{target_path}' 的内容...\n")
-        content = extract_content(target_path)
+        content = extract_content(target_path, extractor, dedupe, workers, **(filters or {}))
         print(content)
         
         # 可选：保存结果
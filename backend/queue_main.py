@@ -0,0 +1,147 @@
+"""
+分布式提取：协调者把文件任务写入共享的 SQLite 队列，多个工作进程（可在不同主机上）领取并写回结果
+
+用法:
+    # 协调者：加入任务（队列数据库放在所有主机都能访问的共享目录）
+    python backend/queue_main.py --queue /shared/tasks.db enqueue /shared/docs
+    # 每台主机：启动若干工作进程，队列处理完后退出
+    python backend/queue_main.py --queue /shared/tasks.db worker --processes 4 --isolated
+    # 查看进度 / 导出结果
+    python backend/queue_main.py --queue /shared/tasks.db status
+    python backend/queue_main.py --queue /shared/tasks.db results --output extracted_content.txt
+"""
+
+import sys
+import os
+import argparse
+import multiprocessing
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.file_utils import get_file_content, iter_supported_files
+from utils.sandbox import SandboxedExtractor
+from utils.task_queue import (
+    TASK_HEARTBEAT_SECONDS, TASK_LEASE_SECONDS, TaskQueue, default_worker_id, run_worker,
+)
+
+
+def worker_main(db_path, isolated=False, timeout=None, lease_seconds=TASK_LEASE_SECONDS,
+                heartbeat_seconds=TASK_HEARTBEAT_SECONDS, exit_when_empty=True):
+    """
+    单个工作进程：领取任务直到队列处理完
+    """
+    worker_id = default_worker_id()
+    options = {
+        "lease_seconds": lease_seconds,
+        "heartbeat_seconds": heartbeat_seconds,
+        "exit_when_empty": exit_when_empty,
+    }
+    if isolated:
+        with SandboxedExtractor(timeout=timeout) as sandbox:
+            stats = run_worker(db_path, worker_id, sandbox.get_file_content, **options)
+    else:
+        stats = run_worker(db_path, worker_id, get_file_content, **options)
+    print(f"工作进程 {worker_id} 结束: {stats}")
+
+
+def run_enqueue(args):
+    """
+    协调者：将文件或目录下的文件加入队列
+    """
+    target_path = Path(args.path)
+    if not target_path.exists():
+        print(f"错误: 路径 '{args.path}' 不存在")
+        return
+    paths = [target_path] if target_path.is_file() else iter_supported_files(target_path)
+    with TaskQueue(args.queue) as tasks:
+        added = tasks.enqueue(paths)
+        print(f"新加入 {added} 个任务，当前队列 {tasks.stats()}")
+
+
+def run_workers(args):
+    """
+    在本机启动若干工作进程，全部结束后返回
+    """
+    options = {
+        "isolated": args.isolated,
+        "timeout": args.timeout,
+        "lease_seconds": args.lease,
+        "heartbeat_seconds": args.heartbeat,
+        "exit_when_empty": not args.wait,
+    }
+    if args.processes <= 1:
+        worker_main(args.queue, **options)
+        return
+
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(args.queue,), kwargs=options)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def run_status(args):
+    """
+    显示队列进度，并回收过期的租约
+    """
+    with TaskQueue(args.queue) as tasks:
+        requeued = tasks.expire_leases()
+        if requeued:
+            print(f"回收了 {requeued} 个过期租约")
+        print(tasks.stats())
+
+
+def run_results(args):
+    """
+    导出已完成和失败的任务结果，格式与 main.py 处理目录时相同
+    """
+    with TaskQueue(args.queue) as tasks:
+        result = []
+        for file_path, content in tasks.results():
+            result.append(f"\n{'='*80}")
+            result.append(f"文件: {file_path}")
+            result.append(f"{'='*80}")
+            result.append(str(content))
+            result.append(f"{'='*80}")
+    content = "\n".join(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(content)
+        print(f"结果已保存到 {args.output}")
+    else:
+        print(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于共享 SQLite 队列的分布式文件提取")
+    parser.add_argument("--queue", required=True, metavar="DB", help="队列数据库路径，多台主机时放在共享文件系统上")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="将文件或目录下的文件加入队列")
+    enqueue_parser.add_argument("path", help="文件或目录路径")
+    enqueue_parser.set_defaults(func=run_enqueue)
+
+    worker_parser = subparsers.add_parser("worker", help="启动工作进程处理队列")
+    worker_parser.add_argument("--processes", type=int, default=1, help="本机启动的工作进程数")
+    worker_parser.add_argument("--isolated", action="store_true", help="在隔离的子进程中处理每个文件，带超时和内存限制")
+    worker_parser.add_argument("--timeout", type=float, default=None, help="隔离模式下单个文件的超时时间 (秒)")
+    worker_parser.add_argument("--lease", type=float, default=TASK_LEASE_SECONDS, help="租约时长 (秒)")
+    worker_parser.add_argument("--heartbeat", type=float, default=TASK_HEARTBEAT_SECONDS, help="续约间隔 (秒)")
+    worker_parser.add_argument("--wait", action="store_true", help="队列处理完后继续等待新任务，而不是退出")
+    worker_parser.set_defaults(func=run_workers)
+
+    status_parser = subparsers.add_parser("status", help="显示队列进度")
+    status_parser.set_defaults(func=run_status)
+
+    results_parser = subparsers.add_parser("results", help="导出提取结果")
+    results_parser.add_argument("--output", metavar="FILE", help="保存到文件，省略时输出到终端")
+    results_parser.set_defaults(func=run_results)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,88 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
 import shutil
 import os
+import tempfile
 import sys
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
 
 # 将项目根目录添加到 python path，以便导入 utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.file_utils import get_file_content
+from utils.sandbox import WarmWorkerPool, WORKER_POOL_SIZE, format_sandbox_result
+from utils.search_index import SearchIndex, SEARCH_INDEX_PATH
+from utils.singleflight import AsyncSingleFlight
+from backend.admission import (
+    AdmissionMiddleware, WeightedScheduler, MAX_UPLOAD_BYTES, CLIENT_RATE_PER_SECOND, CLIENT_BURST,
+    SCHEDULER_AGING_BYTES_PER_SECOND,
+)
+
+# 预热工作进程池大小，设为 0 时在服务进程内直接解析（不隔离）
+EXTRACTION_POOL_SIZE = int(os.environ.get("EXTRACTION_POOL_SIZE", WORKER_POOL_SIZE))
+# 工作进程处理多少个文件后回收重建
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.environ.get("EXTRACTION_MAX_TASKS_PER_CHILD", 50))
+# 单个文件的处理超时时间 (秒)
+EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get("EXTRACTION_TIMEOUT_SECONDS", 120))
+# 全文索引数据库路径
+SEARCH_INDEX_DB = os.environ.get("SEARCH_INDEX_DB", SEARCH_INDEX_PATH)
+# 上传大小上限 (字节)，超过时返回 413
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", MAX_UPLOAD_BYTES))
+# 每个客户端每秒允许的上传数与突发数，超过时返回 429
+UPLOAD_RATE_PER_SECOND = float(os.environ.get("UPLOAD_RATE_PER_SECOND", CLIENT_RATE_PER_SECOND))
+UPLOAD_BURST = int(os.environ.get("UPLOAD_BURST", CLIENT_BURST))
+# 同时进行的解析数，默认与工作进程数相同，其余请求按文件大小加权排队
+EXTRACTION_CONCURRENCY = int(os.environ.get("EXTRACTION_CONCURRENCY", max(EXTRACTION_POOL_SIZE, 1)))
+# 排队老化速度 (字节/秒)，见 backend.admission.WeightedScheduler
+EXTRACTION_AGING_BYTES_PER_SECOND = float(
+    os.environ.get("EXTRACTION_AGING_BYTES_PER_SECOND", SCHEDULER_AGING_BYTES_PER_SECOND)
+)
+
+worker_pool = None
+search_index = None
+scheduler = WeightedScheduler(EXTRACTION_CONCURRENCY, EXTRACTION_AGING_BYTES_PER_SECOND)
+# 内容相同的上传同时到达时只解析一次
+upload_flight = AsyncSingleFlight()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    服务启动时预先创建并预热工作进程池，关闭时回收
+    """
+    global worker_pool, search_index
+    search_index = SearchIndex(SEARCH_INDEX_DB)
+    if EXTRACTION_POOL_SIZE > 0:
+        worker_pool = WarmWorkerPool(
+            size=EXTRACTION_POOL_SIZE,
+            timeout=EXTRACTION_TIMEOUT_SECONDS,
+            max_tasks_per_child=EXTRACTION_MAX_TASKS_PER_CHILD,
+        )
+        await asyncio.to_thread(worker_pool.start)
+    try:
+        yield
+    finally:
+        if worker_pool is not None:
+            worker_pool.close()
+            worker_pool = None
+        search_index.close()
+        search_index = None
+
 
-app = FastAPI(title="文件内容提取服务")
+app = FastAPI(title="文件内容提取服务", lifespan=lifespan)
+
+# 上传准入控制，在读取请求体之前拒绝超限请求；放在 CORS 之内，拒绝响应同样带有跨域头
+app.add_middleware(
+    AdmissionMiddleware,
+    paths=("/upload",),
+    max_body_bytes=UPLOAD_MAX_BYTES,
+    rate=UPLOAD_RATE_PER_SECOND,
+    burst=UPLOAD_BURST,
+)
 
 # 配置 CORS，允许前端访问
 app.add_middleware(
@@ -20,33 +91,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Queue-Wait-Ms"],
 )
 
 UPLOAD_DIR = "temp_uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+
+def extract_file(file_path: Path) -> Dict[str, str]:
+    """
+    提取文件内容：有工作进程池时在池中隔离处理，否则在当前进程处理
+    """
+    if worker_pool is None:
+        return {"status": "ok", "content": get_file_content(file_path)}
+    result = worker_pool.extract(file_path)
+    content = format_sandbox_result(file_path.name, result, worker_pool.timeout, worker_pool.memory_limit)
+    return {"status": result["status"], "content": content}
+
+
+def save_upload(source, file_path):
+    """
+    保存上传的文件，同时计算内容哈希
+
+    返回:
+        (内容哈希, 文件大小)
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    size = 0
+    with open(file_path, "wb") as buffer:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+            buffer.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def extract_upload(file_path: Path, file_size: int):
+    """
+    排队并提取一个上传文件，完成后删除它的临时目录
+
+    返回:
+        (提取结果, 排队等待的秒数)
+    """
+    try:
+        async with scheduler.slot(file_size) as waited:
+            # 解析在线程中进行，避免阻塞事件循环
+            result = await asyncio.to_thread(extract_file, file_path)
+        return result, waited
+    finally:
+        shutil.rmtree(file_path.parent, ignore_errors=True)
+
+
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)) -> Dict[str, str]:
+async def upload_file(response: Response, file: UploadFile = File(...), index: bool = False) -> Dict[str, Any]:
     """
-    上传文件并提取内容
+    上传文件并提取内容，index 为 true 时同时写入全文索引（以文件名为标识）
+
+    解析按文件大小加权排队，返回结果和响应头 X-Queue-Wait-Ms 中包含排队等待的毫秒数。
+    内容和扩展名相同的上传同时到达时只解析一次，共享结果的请求 coalesced 为 true
     """
     try:
-        # 保存上传的文件
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # 提取内容
+        # 每个上传使用独立的临时目录，同名文件并发上传时互不覆盖；去掉文件名中的路径
+        filename = os.path.basename(file.filename or "upload")
+        upload_dir = tempfile.mkdtemp(dir=UPLOAD_DIR)
+        file_path = os.path.join(upload_dir, filename)
+        leader = False
+
         try:
-            content = get_file_content(Path(file_path))
-            return {"filename": file.filename, "content": content}
+            digest, file_size = await asyncio.to_thread(save_upload, file.file, file_path)
+            # 扩展名决定读取函数，一并作为合并的依据
+            key = (digest, Path(filename).suffix.lower())
+            # 发起解析的请求由 extract_upload 负责删除临时文件，即使该请求被取消，其他等待者仍在使用
+            leader = not upload_flight.running(key)
+            (result, waited), coalesced = await upload_flight.do(key, extract_upload, Path(file_path), file_size)
+            queue_wait_ms = round(waited * 1000, 1)
+            response.headers["X-Queue-Wait-Ms"] = str(queue_wait_ms)
+            if index and result["status"] == "ok":
+                await asyncio.to_thread(search_index.add_document, filename, result["content"], file_size)
+            return {"filename": filename, **result, "queue_wait_ms": queue_wait_ms, "coalesced": coalesced}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"文件解析失败: {str(e)}")
         finally:
             # 清理临时文件
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            if not leader:
+                shutil.rmtree(upload_dir, ignore_errors=True)
                 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -54,6 +185,25 @@ async def upload_file(file: UploadFile = File(...)) -> Dict[str, str]:
 def read_root():
     return {"message": "文件提取服务正在运行"}
 
+@app.get("/search")
+def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=200)) -> Dict[str, Any]:
+    """
+    在全文索引中检索，返回命中的文件与页/工作表
+    """
+    return {"query": q, "hits": search_index.search(q, limit=limit)}
+
+@app.get("/health")
+def health():
+    """
+    服务健康状态，包含工作进程池与解析排队的统计信息
+    """
+    return {
+        "status": "ok",
+        "worker_pool": worker_pool.stats() if worker_pool is not None else None,
+        "scheduler": scheduler.stats(),
+        "upload_flight": upload_flight.stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
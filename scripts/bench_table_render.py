@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格渲染性能对比脚本
+比较 utils.table_utils.render_dataframe 与 pandas to_markdown (tabulate) 在宽表上的耗时
+
+用法:
+    python scripts/bench_table_render.py --rows 100000 --cols 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.table_utils import render_dataframe
+
+
+def make_sheet(rows, cols, seed=0):
+    """生成模拟工作表：整数列、含空值的浮点列和文本列交替出现"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(cols):
+        kind = i % 3
+        if kind == 0:
+            data[f"整数{i}"] = rng.integers(0, 1_000_000, rows)
+        elif kind == 1:
+            values = rng.random(rows) * 1000
+            values[rng.random(rows) < 0.1] = np.nan
+            data[f"小数{i}"] = values
+        else:
+            data[f"文本{i}"] = rng.choice(["北京", "上海", "广州", "深圳|南山", "产品A"], rows)
+    return pd.DataFrame(data)
+
+
+def timed(label, func):
+    """执行并打印耗时，返回结果"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f} 秒  输出 {len(result) / 1024 / 1024:8.2f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="表格渲染性能对比")
+    parser.add_argument("--rows", type=int, default=100_000, help="行数")
+    parser.add_argument("--cols", type=int, default=20, help="列数")
+    parser.add_argument("--skip-tabulate", action="store_true", help="跳过 tabulate 对比（行数很大时较慢）")
+    args = parser.parse_args()
+
+    df = make_sheet(args.rows, args.cols)
+    print(f"测试数据: {args.rows} 行 x {args.cols} 列\n")
+
+    renderer = timed("render_dataframe", lambda: render_dataframe(df))
+    timed("render_dataframe(align)", lambda: render_dataframe(df, align=True))
+
+    if not args.skip_tabulate:
+        try:
+            baseline = timed("to_markdown (tabulate)", lambda: df.to_markdown(index=False))
+            print(f"\n加速比: {baseline / renderer:.1f}x")
+        except ImportError:
+            print("未安装 tabulate，跳过对比")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发压测脚本
+生成一批混合类型的测试文档，按比例随机回放到:
+    upload  - backend/server.py 的 /upload 接口（默认自动启动本地服务）
+    feishu  - feishu_main.main，文档由本地 HTTP 文件服务器提供
+输出吞吐量、延迟分位数、错误率，以及压测期间被测进程（含工作进程）的 RSS 变化
+
+用法:
+    python scripts/load_test.py --target upload --concurrency 8 --requests 500
+    python scripts/load_test.py --target feishu --duration 60 --mix txt=4,csv=2,xlsx=2,docx=1,pdf=1
+    python scripts/load_test.py --target upload --url http://127.0.0.1:8000 --json report.json
+"""
+
+import argparse
+import contextlib
+import functools
+import http.server
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# 默认的文档类型比例
+DEFAULT_MIX = "txt=4,csv=2,xlsx=2,docx=1,pptx=1,pdf=1"
+# 每类文档生成的份数，内容各不相同，避免请求被合并
+DEFAULT_DOCS_PER_KIND = 20
+# 服务启动的超时时间 (秒)
+SERVER_START_TIMEOUT_SECONDS = 60
+# 延迟分位数
+PERCENTILES = (50, 90, 95, 99)
+
+_WORDS = ["销售", "合同", "季度", "报告", "客户", "产品", "data", "report", "北京", "上海", "库存", "预算"]
+
+
+def _paragraph(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _make_txt(path, rng):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(rng.randint(20, 400)):
+            f.write(_paragraph(rng, 20) + "\n")
+
+
+def _make_frame(rng):
+    rows = rng.randint(50, 3000)
+    return pd.DataFrame({
+        "编号": range(rows),
+        "城市": [rng.choice(_WORDS) for _ in range(rows)],
+        "数量": [rng.randint(0, 1000) for _ in range(rows)],
+        "金额": [round(rng.random() * 10000, 2) for _ in range(rows)],
+    })
+
+
+def _make_csv(path, rng):
+    _make_frame(rng).to_csv(path, index=False)
+
+
+def _make_xlsx(path, rng):
+    with pd.ExcelWriter(path) as writer:
+        for sheet in range(rng.randint(1, 3)):
+            _make_frame(rng).to_excel(writer, sheet_name=f"工作表{sheet + 1}", index=False)
+
+
+def _make_docx(path, rng):
+    from docx import Document
+    doc = Document()
+    for _ in range(rng.randint(5, 60)):
+        doc.add_paragraph(_paragraph(rng, 30))
+    table = doc.add_table(rows=5, cols=3)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = rng.choice(_WORDS)
+    doc.save(path)
+
+
+def _make_pptx(path, rng):
+    from pptx import Presentation
+    from pptx.util import Inches
+    prs = Presentation()
+    for _ in range(rng.randint(2, 15)):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = _paragraph(rng, 3)
+        slide.placeholders[1].text = _paragraph(rng, 40)
+        slide.shapes.add_table(3, 3, Inches(1), Inches(4), Inches(6), Inches(1))
+    prs.save(path)
+
+
+def _make_pdf(path, rng):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    c = canvas.Canvas(path, pagesize=A4)
+    for _ in range(rng.randint(1, 10)):
+        for line in range(40):
+            # reportlab 默认字体不含中文，PDF 只写英文
+            c.drawString(50, 800 - line * 18, " ".join(rng.choice(["data", "report", "sales", "q3"]) for _ in range(12)))
+        c.showPage()
+    c.save()
+
+
+# 文档类型 -> 生成函数
+GENERATORS = {
+    "txt": _make_txt,
+    "csv": _make_csv,
+    "xlsx": _make_xlsx,
+    "docx": _make_docx,
+    "pptx": _make_pptx,
+    "pdf": _make_pdf,
+}
+
+
+def generate_corpus(out_dir, kinds, docs_per_kind, seed):
+    """
+    生成测试文档，同一 seed 生成的文档相同
+
+    返回:
+        {文档类型: [文件路径, ...]}，缺少生成所需依赖的类型会被跳过
+    """
+    rng = random.Random(seed)
+    corpus = {}
+    for kind in kinds:
+        paths = []
+        try:
+            for i in range(docs_per_kind):
+                path = os.path.join(out_dir, f"{kind}_{i:04d}.{kind}")
+                GENERATORS[kind](path, rng)
+                paths.append(path)
+        except ImportError as e:
+            print(f"跳过 {kind} 文档: {e}")
+            continue
+        corpus[kind] = paths
+    return corpus
+
+
+def parse_mix(text):
+    """
+    解析 "txt=4,csv=2" 形式的比例
+    """
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in GENERATORS:
+            raise ValueError(f"未知的文档类型: {kind}，可选 {', '.join(GENERATORS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _process_tree(pid):
+    """
+    返回进程及其所有子孙进程的 PID（读取 /proc，仅限 Linux）
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # 进程名可能包含空格，从最后一个右括号之后解析
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+class RssSampler(threading.Thread):
+    """
+    定期采样被测进程树的 RSS 总和与进程数
+    """
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._start = time.monotonic()
+
+    def run(self):
+        while True:
+            pids = _process_tree(self.pid)
+            self.samples.append((time.monotonic() - self._start, sum(map(_rss_bytes, pids)), len(pids)))
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(work_dir, pool_size):
+    """
+    在子进程中启动 backend/server.py，限流放宽到不影响压测，返回 (进程, 地址)
+    """
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "UPLOAD_RATE_PER_SECOND": "1000000",
+        "UPLOAD_BURST": "1000000",
+        "SEARCH_INDEX_DB": os.path.join(work_dir, "search_index.db"),
+    })
+    if pool_size is not None:
+        env["EXTRACTION_POOL_SIZE"] = str(pool_size)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=work_dir, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {process.returncode}")
+        try:
+            requests.get(f"{url}/health", timeout=1).raise_for_status()
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("服务启动超时")
+
+
+def serve_directory(directory):
+    """
+    启动本地 HTTP 文件服务器，返回 (服务器, 地址)
+    """
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def upload_request(url):
+    """
+    返回对 /upload 发起一次请求的函数，结果为 (是否成功, 状态)
+    """
+    session = threading.local()
+
+    def send(path):
+        if not hasattr(session, "client"):
+            session.client = requests.Session()
+        with open(path, "rb") as f:
+            response = session.client.post(f"{url}/upload", files={"file": (os.path.basename(path), f)}, timeout=600)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}"
+        status = response.json().get("status", "ok")
+        return status == "ok", status
+
+    return send
+
+
+def feishu_request(base_url):
+    """
+    返回调用 feishu_main.main 的函数，文档通过本地 HTTP 文件服务器下载
+    """
+    from backend.feishu_main import main as feishu_main
+
+    def send(path):
+        content = feishu_main(f"{base_url}/{os.path.basename(path)}")
+        failed = content.startswith(("错误", "处理文件时发生错误", "无法"))
+        return not failed, "error" if failed else "ok"
+
+    return send
+
+
+def run_load(send, corpus, mix, concurrency, total_requests, duration, seed):
+    """
+    按比例随机选择文档并发回放，达到请求数或持续时间后停止
+
+    返回:
+        (结果列表, 总耗时)；每项包含 kind、latency、ok、status
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind in mix if kind in corpus]
+    weights = [mix[kind] for kind in kinds]
+    results = []
+    # 已发出但尚未完成的请求数
+    pending = [0]
+    lock = threading.Lock()
+    start = time.monotonic()
+    deadline = start + duration if duration else None
+
+    def next_document():
+        with lock:
+            if total_requests and len(results) + pending[0] >= total_requests:
+                return None
+            if deadline and time.monotonic() >= deadline:
+                return None
+            pending[0] += 1
+            kind = rng.choices(kinds, weights)[0]
+            return kind, rng.choice(corpus[kind])
+
+    def client():
+        while True:
+            document = next_document()
+            if document is None:
+                return
+            kind, path = document
+            began = time.monotonic()
+            try:
+                ok, status = send(path)
+            except Exception as e:
+                ok, status = False, type(e).__name__
+            with lock:
+                pending[0] -= 1
+                results.append({"kind": kind, "latency": time.monotonic() - began, "ok": ok, "status": status})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    return results, time.monotonic() - start
+
+
+def _percentile(sorted_values, percent):
+    """
+    最近秩法计算分位数
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    summary = {f"p{p}_ms": round(_percentile(latencies, p) * 1000, 1) for p in PERCENTILES}
+    summary["max_ms"] = round(latencies[-1] * 1000, 1) if latencies else 0.0
+    return summary
+
+
+def summarize(target, results, elapsed, samples):
+    """
+    汇总压测结果
+    """
+    errors = sum(1 for r in results if not r["ok"])
+    by_kind = {}
+    for kind in sorted({r["kind"] for r in results}):
+        kind_results = [r for r in results if r["kind"] == kind]
+        by_kind[kind] = {
+            "requests": len(kind_results),
+            "errors": sum(1 for r in kind_results if not r["ok"]),
+            **_latency_summary([r["latency"] for r in kind_results]),
+        }
+    return {
+        "target": target,
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "statuses": dict(Counter(r["status"] for r in results)),
+        "latency": _latency_summary([r["latency"] for r in results]),
+        "by_kind": by_kind,
+        "rss": [
+            {"t_s": round(t, 1), "rss_mb": round(rss / 1024 / 1024, 1), "processes": count}
+            for t, rss, count in samples
+        ],
+    }
+
+
+def print_report(report):
+    latency = report["latency"]
+    print(f"\n[{report['target']}] {report['requests']} 个请求，耗时 {report['elapsed_s']} 秒，"
+          f"吞吐量 {report['throughput_rps']} 请求/秒，错误率 {report['error_rate'] * 100:.2f}%")
+    print(f"状态: {report['statuses']}")
+    print("延迟 (ms): " + "  ".join(f"{name[:-3]}={value}" for name, value in latency.items()))
+    print(f"\n{'类型':<6}{'请求':>8}{'错误':>6}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'max':>10}")
+    for kind, stats in report["by_kind"].items():
+        print(f"{kind:<8}{stats['requests']:>8}{stats['errors']:>6}"
+              + "".join(f"{stats[f'p{p}_ms']:>10}" for p in PERCENTILES) + f"{stats['max_ms']:>10}")
+    if report["rss"]:
+        peak = max(report["rss"], key=lambda s: s["rss_mb"])
+        print(f"\nRSS: 起始 {report['rss'][0]['rss_mb']} MB，峰值 {peak['rss_mb']} MB (第 {peak['t_s']} 秒)，"
+              f"结束 {report['rss'][-1]['rss_mb']} MB")
+        step = max(1, len(report["rss"]) // 20)
+        for sample in report["rss"][::step]:
+            print(f"  {sample['t_s']:>7} s  {sample['rss_mb']:>8} MB  {sample['processes']} 个进程")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件提取服务并发压测")
+    parser.add_argument("--target", choices=["upload", "feishu", "both"], default="upload", help="压测对象")
+    parser.add_argument("--url", help="已运行的服务地址，省略时自动启动本地服务")
+    parser.add_argument("--pool-size", type=int, default=None, help="自动启动服务时的工作进程池大小")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=200, help="总请求数，0 表示只按持续时间")
+    parser.add_argument("--duration", type=float, default=0, help="持续时间 (秒)，0 表示只按请求数")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="文档类型比例，如 txt=4,csv=2,pdf=1")
+    parser.add_argument("--docs-per-kind", type=int, default=DEFAULT_DOCS_PER_KIND, help="每类文档生成的份数")
+    parser.add_argument("--docs-dir", help="测试文档目录，省略时生成到临时目录")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同的文档和请求序列")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="RSS 采样间隔 (秒)")
+    parser.add_argument("--json", metavar="FILE", help="将结果保存为 JSON，便于比较不同版本")
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error("--requests 和 --duration 不能同时为 0")
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as work_dir:
+        docs_dir = args.docs_dir or os.path.join(work_dir, "docs")
+        os.makedirs(docs_dir, exist_ok=True)
+        print(f"生成测试文档到 {docs_dir} ...")
+        corpus = generate_corpus(docs_dir, mix, args.docs_per_kind, args.seed)
+        print("文档: " + ", ".join(f"{kind} x {len(paths)}" for kind, paths in corpus.items()))
+
+        reports = []
+        targets = ["upload", "feishu"] if args.target == "both" else [args.target]
+        for target in targets:
+            server_process = None
+            file_server = None
+            try:
+                if target == "upload":
+                    if args.url:
+                        url = args.url.rstrip("/")
+                        # 外部服务无法采样 RSS，只统计请求结果
+                        sampler = None
+                    else:
+                        server_process, url = start_server(work_dir, args.pool_size)
+                        sampler = RssSampler(server_process.pid, args.sample_interval)
+                    send = upload_request(url)
+                else:
+                    file_server, base_url = serve_directory(docs_dir)
+                    sampler = RssSampler(os.getpid(), args.sample_interval)
+                    send = feishu_request(base_url)
+
+                print(f"\n开始压测 {target}: 并发 {args.concurrency}，"
+                      f"{f'{args.requests} 个请求' if args.requests else f'{args.duration} 秒'}")
+                if sampler:
+                    sampler.start()
+                with contextlib.ExitStack() as quiet:
+                    if target == "feishu":
+                        # feishu_main 会打印下载进度，压测期间写到 /dev/null；
+                        # 不能缓存在内存中，否则会计入本进程被采样的 RSS
+                        quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+                    results, elapsed = run_load(
+                        send, corpus, mix, args.concurrency, args.requests, args.duration, args.seed,
+                    )
+                if sampler:
+                    sampler.stop()
+                report = summarize(target, results, elapsed, sampler.samples if sampler else [])
+                print_report(report)
+                reports.append(report)
+            finally:
+                if server_process is not None:
+                    server_process.terminate()
+                    server_process.wait(timeout=30)
+                if file_server is not None:
+                    file_server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sandbox import (
+    STATUS_OK, STATUS_UNAVAILABLE, SandboxedExtractor, WarmWorkerPool, format_sandbox_result,
+)
+
+
+class SandboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "a.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("你好 hello")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class SandboxedExtractorTest(SandboxTestCase):
+    def test_extract(self):
+        with SandboxedExtractor(timeout=60) as extractor:
+            result = extractor.extract(self.path)
+            self.assertEqual(result["status"], STATUS_OK)
+            self.assertEqual(result["content"], "你好 hello")
+            self.assertEqual(extractor.get_file_content(self.path), "你好 hello")
+
+    def test_no_pool_only_methods(self):
+        # 单进程隔离器没有空闲队列，不应带有进程池的等待逻辑
+        self.assertFalse(hasattr(SandboxedExtractor, "_acquire"))
+
+
+class WarmWorkerPoolTest(SandboxTestCase):
+    def test_extract(self):
+        with WarmWorkerPool(size=1, timeout=60) as pool:
+            self.assertEqual(pool.get_file_content(self.path), "你好 hello")
+            self.assertEqual(pool.stats()["completed"], 1)
+
+    def test_acquire_timeout(self):
+        with WarmWorkerPool(size=1, timeout=60, acquire_timeout=0.5) as pool:
+            worker = pool._acquire()
+            try:
+                result = pool.extract(self.path)
+            finally:
+                pool._release(worker)
+            self.assertEqual(result["status"], STATUS_UNAVAILABLE)
+            self.assertIn("没有可用的工作进程", format_sandbox_result("a.txt", result, 60, None))
+            self.assertEqual(pool.get_file_content(self.path), "你好 hello")
+
+    def test_close_releases_waiters(self):
+        pool = WarmWorkerPool(size=1, timeout=60, acquire_timeout=60)
+        pool.start()
+        worker = pool._acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(pool.extract(self.path)))
+        waiter.start()
+        time.sleep(0.2)
+        pool.close()
+        waiter.join(10)
+        pool._discard(worker)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(results[0]["status"], STATUS_UNAVAILABLE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils.file_utils import get_file_content, iter_supported_files
+from utils.scanner import extract_as_scanned
+
+# 记录状态：开始提取、提取完成、提取函数抛出异常
+STATUS_STARTED = "started"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+
+class BatchJob:
+    """
+    可断点续跑的批量提取任务，结果逐条追加写入 JSONL 文件，文件本身即为检查点
+
+    每个文件提取前先写入 started 记录，完成后写入 done 记录（含内容）。重新运行时
+    跳过已完成的文件；只有 started 没有 done 的文件说明上次运行在提取它时中断，
+    默认不再重试（每个文件至多提取一次），避免导致崩溃的文件反复拖垮任务。
+
+    用法:
+        with BatchJob("results.jsonl") as job:
+            report = job.run(iter_supported_files("docs"))
+        contents = load_batch_results("results.jsonl")
+    """
+    def __init__(self, output_path, retry_interrupted=False, fsync=False):
+        """
+        参数:
+            output_path: JSONL 结果文件路径，不存在时新建
+            retry_interrupted: 是否重新提取上次中断时正在处理的文件
+            fsync: 每条记录是否同步写入磁盘；进程被杀时已 flush 的记录不会丢失，
+                只有需要防止整机断电时才需要开启
+        """
+        self.output_path = Path(output_path)
+        self.retry_interrupted = retry_interrupted
+        self.fsync = fsync
+        self.completed = set()
+        self.interrupted = set()
+        self._load()
+        self._file = open(self.output_path, "a", encoding="utf-8")
+        # 并行提取时 started 记录在工作线程中写入
+        self._write_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self._file.close()
+
+    def _load(self):
+        """
+        读取已有的结果文件，恢复已完成和中断的文件集合
+
+        进程在写入一行的中途被杀时，末尾会留下不完整的一行，先截断再继续追加
+        """
+        if not self.output_path.exists():
+            return
+
+        started = set()
+        valid_length = 0
+        with open(self.output_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_length += len(line)
+                if record.get("status") == STATUS_STARTED:
+                    started.add(record["path"])
+                else:
+                    self.completed.add(record["path"])
+
+        if valid_length < self.output_path.stat().st_size:
+            with open(self.output_path, "r+b") as f:
+                f.truncate(valid_length)
+        self.interrupted = started - self.completed
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._write_lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def pending(self, path):
+        """
+        文件是否需要（重新）提取
+        """
+        path = str(path)
+        if path in self.completed:
+            return False
+        return self.retry_interrupted or path not in self.interrupted
+
+    def mark_started(self, path):
+        """
+        提取前写入 started 记录
+        """
+        self._write({"path": str(path), "status": STATUS_STARTED, "time": time.time()})
+
+    def record(self, path, content, status=STATUS_DONE):
+        """
+        写入提取结果
+        """
+        path = str(path)
+        self._write({"path": path, "status": status, "time": time.time(), "content": content})
+        self.completed.add(path)
+        self.interrupted.discard(path)
+
+    def run(self, paths, extractor=None, workers=1):
+        """
+        提取尚未完成的文件，每完成一个立即写入结果文件
+
+        参数:
+            paths: 文件路径的可迭代对象（如 iter_supported_files 的结果）
+            extractor: 提取单个文件内容的函数，默认为 get_file_content
+            workers: 并行提取的文件数
+
+        返回:
+            报告字典：total（文件总数）、done（本次完成数）、errors（提取抛出异常数）、
+            skipped（之前已完成数）、interrupted（上次中断且未重试的文件列表）
+        """
+        extractor = extractor or get_file_content
+        report = {"total": 0, "done": 0, "errors": 0, "skipped": 0, "interrupted": []}
+
+        def safe_extract(path):
+            # started 记录紧挨着提取写入：并行时已排队但尚未开始的文件不会被误记为中断
+            self.mark_started(path)
+            try:
+                return STATUS_DONE, extractor(path)
+            except Exception as e:
+                return STATUS_ERROR, f"提取文件 {path} 时出错: {str(e)}"
+
+        def iter_pending():
+            for path in paths:
+                report["total"] += 1
+                if str(path) in self.completed:
+                    report["skipped"] += 1
+                elif not self.pending(path):
+                    report["interrupted"].append(str(path))
+                else:
+                    yield path
+
+        if workers > 1:
+            results = extract_as_scanned(iter_pending(), safe_extract, workers)
+        else:
+            results = ((path, safe_extract(path)) for path in iter_pending())
+
+        for path, (status, content) in results:
+            self.record(path, content, status)
+            report["done" if status == STATUS_DONE else "errors"] += 1
+        return report
+
+
+def run_batch_job(directory, output_path, file_extensions=None, exclude_dirs=None, extractor=None,
+                  workers=1, retry_interrupted=False, **filters):
+    """
+    对文件或目录运行可续跑的批量提取，参数含义与 read_all_files 相同
+
+    返回:
+        报告字典，格式见 BatchJob.run
+    """
+    path = Path(directory)
+    paths = [path] if path.is_file() else iter_supported_files(path, file_extensions, exclude_dirs, **filters)
+    with BatchJob(output_path, retry_interrupted=retry_interrupted) as job:
+        return job.run(paths, extractor, workers)
+
+
+def load_batch_results(output_path):
+    """
+    读取批量任务的结果文件
+
+    返回:
+        文件内容字典，键为文件路径；同一文件有多条结果时以最后一条为准
+    """
+    results = {}
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") != STATUS_STARTED:
+                results[record["path"]] = record.get("content")
+    return results
+
+
+def format_batch_report(report):
+    """
+    将批量任务报告格式化为文本
+    """
+    lines = [
+        f"共 {report['total']} 个文件，本次完成 {report['done']} 个，出错 {report['errors']} 个，"
+        f"之前已完成 {report['skipped']} 个"
+    ]
+    if report["interrupted"]:
+        lines.append(f"上次运行在以下 {len(report['interrupted'])} 个文件处中断，未重试 (使用 --retry-interrupted 重试):")
+        for path in report["interrupted"]:
+            lines.append(f"    {path}")
+    return "\n".join(lines)
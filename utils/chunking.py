@@ -0,0 +1,189 @@
+import math
+import re
+from pathlib import Path
+
+from utils.file_utils import get_file_content, iter_sections, iter_supported_files
+
+# 默认每个分块的 token 上限
+CHUNK_MAX_TOKENS = 2000
+
+# CJK 字符（含全角标点）按每字 1 个 token 估算，其余字符按每 4 个字符 1 个 token 估算
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+# 段落之间以空行分隔
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+
+def estimate_tokens(text):
+    """
+    估算文本的 token 数，不依赖具体模型的分词器
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class _Limit:
+    """
+    分块大小上限，按片段累加字符数和 token 数，避免反复拼接整个分块再计算
+    """
+    def __init__(self, max_tokens, max_chars, count_tokens):
+        self.max_tokens = max_tokens
+        self.max_chars = max_chars
+        self.count_tokens = count_tokens
+
+    def measure(self, text):
+        return len(text), self.count_tokens(text) if self.max_tokens is not None else 0
+
+    def fits(self, chars, tokens):
+        if self.max_chars is not None and chars > self.max_chars:
+            return False
+        return self.max_tokens is None or tokens <= self.max_tokens
+
+
+def _iter_blocks(text):
+    """
+    将章节文本划分为不可再分的块：表格整体为一块，其余按空行分段
+    """
+    for paragraph in _BLANK_LINES.split(text):
+        lines = paragraph.strip("\n").split("\n")
+        buffer = []
+        in_table = False
+        for line in lines:
+            is_table_line = line.startswith("|")
+            if buffer and is_table_line != in_table:
+                yield "\n".join(buffer), in_table
+                buffer = []
+            buffer.append(line)
+            in_table = is_table_line
+        if buffer and any(line.strip() for line in buffer):
+            yield "\n".join(buffer), in_table
+
+
+def _split_line(line, limit):
+    """
+    单行超出上限时按字符切分，每段取满足上限的最长前缀
+    """
+    while line:
+        size = len(line)
+        while size > 1 and not limit.fits(*limit.measure(line[:size])):
+            size //= 2
+        yield line[:size]
+        line = line[size:]
+
+
+def _split_oversized(block, is_table, limit):
+    """
+    将超出上限的块继续拆分：表格按行拆分并在每段重复表头，文本按行再按字符拆分
+    """
+    lines = block.split("\n")
+    header = lines[:2] if is_table and len(lines) > 2 else []
+    header_chars, header_tokens = limit.measure("\n".join(header)) if header else (0, 0)
+
+    piece, chars, tokens = list(header), header_chars, header_tokens
+    for line in lines[len(header):]:
+        # 换行符与行一起计算：估算的 token 数向上取整，逐段累加不会低于整段的实际值
+        line_chars, line_tokens = limit.measure("\n" + line) if piece else limit.measure(line)
+        if limit.fits(chars + line_chars, tokens + line_tokens):
+            piece.append(line)
+            chars, tokens = chars + line_chars, tokens + line_tokens
+            continue
+        if len(piece) > len(header):
+            yield "\n".join(piece)
+            piece, chars, tokens = list(header), header_chars, header_tokens
+            line_chars, line_tokens = limit.measure("\n" + line) if piece else limit.measure(line)
+        if limit.fits(chars + line_chars, tokens + line_tokens):
+            piece.append(line)
+            chars, tokens = chars + line_chars, tokens + line_tokens
+        else:
+            yield from _split_line(line, limit)
+    if len(piece) > len(header):
+        yield "\n".join(piece)
+
+
+def iter_chunks(content, source=None, max_tokens=CHUNK_MAX_TOKENS, max_chars=None, token_counter=None):
+    """
+    将提取结果按 页/工作表/表格/段落 边界切分为有大小上限的分块
+
+    相邻的小章节会合并到同一分块；单个章节超出上限时在段落和表格边界拆分，
+    表格拆分后每段都保留表头；单个段落仍然超出时才按行、按字符硬切分。
+    token 数按片段（含分隔符）累加估算：默认的 estimate_tokens 向上取整，累加值不低于
+    整个分块的实际值，分块不会超过上限；使用自定义 token_counter 时分块的实际 token 数
+    可能与上限略有出入。
+
+    参数:
+        content: get_file_content 返回的文本
+        source: 分块的来源（文件路径或URL），写入元数据
+        max_tokens: 每个分块的 token 上限，None 表示不限制
+        max_chars: 每个分块的字符数上限，None 表示不限制
+        token_counter: 计算 token 数的函数，默认为 estimate_tokens
+
+    返回:
+        生成器，产出字典：source、sections（覆盖的章节名列表）、chunk_index、
+        text、chars、tokens
+    """
+    count_tokens = token_counter or estimate_tokens
+    limit = _Limit(max_tokens, max_chars, count_tokens)
+
+    chunk_index = 0
+    parts, sections = [], []
+    chars = tokens = 0
+
+    def flush():
+        nonlocal chunk_index
+        text = "\n\n".join(parts)
+        chunk_index += 1
+        return {
+            "source": source,
+            "sections": list(sections),
+            "chunk_index": chunk_index - 1,
+            "text": text,
+            "chars": len(text),
+            "tokens": count_tokens(text),
+        }
+
+    for section, text in iter_sections(content):
+        # 带上章节标题，单独阅读分块时仍能知道出处
+        if section:
+            text = f"### {section}\n{text}"
+        blocks = [(text, False)] if limit.fits(*limit.measure(text)) else _iter_blocks(text)
+        for block, is_table in blocks:
+            block_chars, block_tokens = limit.measure(block)
+            if limit.fits(block_chars, block_tokens):
+                pieces = [(block, block_chars, block_tokens)]
+            else:
+                pieces = ((piece, *limit.measure(piece)) for piece in _split_oversized(block, is_table, limit))
+            for piece, piece_chars, piece_tokens in pieces:
+                # 片段之间以空行连接，分隔符与片段一起计算字符数和 token 数
+                added = limit.measure("\n\n" + piece) if parts else (piece_chars, piece_tokens)
+                if parts and not limit.fits(chars + added[0], tokens + added[1]):
+                    yield flush()
+                    parts, sections = [], []
+                    chars = tokens = 0
+                    added = (piece_chars, piece_tokens)
+                chars += added[0]
+                tokens += added[1]
+                parts.append(piece)
+                if section not in sections:
+                    sections.append(section)
+    if parts:
+        yield flush()
+
+
+def iter_path_chunks(path, max_tokens=CHUNK_MAX_TOKENS, max_chars=None, token_counter=None,
+                     file_extensions=None, exclude_dirs=None, extractor=None):
+    """
+    对文件或目录逐个文件提取并分块，目录下的文件逐个处理，不拼接成整体字符串
+
+    返回:
+        生成器，产出与 iter_chunks 相同的字典，chunk_index 在每个文件内从 0 开始
+    """
+    extractor = extractor or get_file_content
+    path = Path(path)
+    files = [path] if path.is_file() else iter_supported_files(path, file_extensions, exclude_dirs)
+    for file_path in files:
+        yield from iter_chunks(
+            extractor(file_path),
+            source=str(file_path),
+            max_tokens=max_tokens,
+            max_chars=max_chars,
+            token_counter=token_counter,
+        )
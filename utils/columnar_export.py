@@ -0,0 +1,171 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from utils.table_utils import render_dataframe
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    # 没有 pyarrow 时无法写 Parquet/Arrow，退回 gzip 压缩的 CSV
+    pyarrow = None
+
+# 导出格式
+COLUMNAR_PARQUET = "parquet"
+COLUMNAR_ARROW = "arrow"
+COLUMNAR_CSV_GZ = "csv.gz"
+# 默认导出格式：安装了 pyarrow 时使用 Parquet
+COLUMNAR_DEFAULT_FORMAT = COLUMNAR_PARQUET if pyarrow is not None else COLUMNAR_CSV_GZ
+# 预览表格的行数
+COLUMNAR_PREVIEW_ROWS = 20
+
+# 工作表名中不适合出现在文件名里的字符
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def _column_names(header):
+    """
+    将表头行转换为唯一的字符串列名，空表头命名为 "列N"，重复的加序号
+    """
+    names = []
+    seen = {}
+    for i, value in enumerate(header, 1):
+        name = "" if pd.isna(value) else str(value).strip()
+        if isinstance(value, float) and value.is_integer():
+            name = str(int(value))
+        name = name or f"列{i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        names.append(name)
+    return names
+
+
+def _normalize_types(df):
+    """
+    恢复去掉表头行后的列类型；仍混有多种类型的列转换为字符串，列式格式要求每列类型一致
+    """
+    df = df.infer_objects()
+    for column in df.columns:
+        if df[column].dtype == object:
+            values = df[column]
+            df[column] = values.where(values.isna(), values.astype(str))
+    return df
+
+
+def _prepare_sheet(sheet_data):
+    """
+    与 read_excel_file 相同的清理方式：删除全空的行和列，第一行非空时作为表头
+    """
+    sheet_data = sheet_data.dropna(how='all', axis=0)
+    sheet_data = sheet_data.dropna(how='all', axis=1)
+    if len(sheet_data) > 0 and sheet_data.iloc[0].notna().any():
+        header = sheet_data.iloc[0]
+        sheet_data = sheet_data[1:].copy()
+    else:
+        header = [None] * sheet_data.shape[1]
+        sheet_data = sheet_data.copy()
+    sheet_data.columns = _column_names(header)
+    return _normalize_types(sheet_data.reset_index(drop=True))
+
+
+def _read_sheets(file_path):
+    """
+    读取表格文件的所有工作表，返回 {工作表名: DataFrame}
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.csv':
+        return {Path(file_path).stem: _normalize_types(pd.read_csv(file_path))}
+    engine = 'xlrd' if suffix == '.xls' else None
+    sheets = pd.read_excel(file_path, sheet_name=None, header=None, engine=engine)
+    return {str(name): _prepare_sheet(data) for name, data in sheets.items()}
+
+
+def _export_prefix(file_path):
+    """
+    数据文件名的前缀：文件名加上源文件绝对路径的短哈希
+
+    不同目录下的同名文件导出到同一目录时互不覆盖，同一文件重复导出时覆盖上次的结果
+    """
+    source = os.path.abspath(os.fspath(file_path))
+    digest = hashlib.blake2b(source.encode("utf-8", "surrogateescape"), digest_size=5).hexdigest()
+    return f"{Path(source).stem}-{digest}"
+
+
+def write_columnar(df, path, fmt=COLUMNAR_DEFAULT_FORMAT):
+    """
+    将 DataFrame 写为压缩的列式文件
+
+    参数:
+        df: 要写入的数据
+        path: 输出文件路径（不含扩展名，按格式自动添加）
+        fmt: COLUMNAR_PARQUET / COLUMNAR_ARROW / COLUMNAR_CSV_GZ
+
+    返回:
+        实际写入的文件路径
+    """
+    path = Path(f"{path}.{fmt}")
+    if fmt == COLUMNAR_PARQUET:
+        df.to_parquet(path, compression="zstd", index=False)
+    elif fmt == COLUMNAR_ARROW:
+        df.to_feather(path, compression="zstd")
+    elif fmt == COLUMNAR_CSV_GZ:
+        df.to_csv(path, index=False, compression="gzip")
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    return path
+
+
+def read_columnar(path):
+    """
+    读取 write_columnar 写出的文件，返回 DataFrame
+    """
+    name = str(path)
+    if name.endswith("." + COLUMNAR_PARQUET):
+        return pd.read_parquet(path)
+    if name.endswith("." + COLUMNAR_ARROW):
+        return pd.read_feather(path)
+    return pd.read_csv(path, compression="gzip")
+
+
+def export_spreadsheet(file_path, output_dir, fmt=None, preview_rows=COLUMNAR_PREVIEW_ROWS):
+    """
+    将表格文件（.xlsx/.xls/.csv）的每个工作表导出为压缩的列式文件，返回 Markdown 预览
+
+    预览中每个工作表保留原有的 "### 工作表: 名称" 标题，列出数据文件路径、行列数，
+    并只渲染前 preview_rows 行；下游需要完整数据时直接读取数据文件，无需解析 Markdown
+
+    参数:
+        file_path: 表格文件路径
+        output_dir: 数据文件的输出目录，不存在时创建；文件名为 "文件名-路径哈希.序号-工作表名.格式"
+        fmt: 导出格式，默认为 COLUMNAR_DEFAULT_FORMAT
+        preview_rows: 预览的行数
+
+    返回:
+        Markdown 预览文本，出错时返回错误信息
+    """
+    fmt = fmt or COLUMNAR_DEFAULT_FORMAT
+    try:
+        if fmt in (COLUMNAR_PARQUET, COLUMNAR_ARROW) and pyarrow is None:
+            return f"无法导出表格文件 {file_path}: 导出 {fmt} 格式需要安装 pyarrow"
+        os.makedirs(output_dir, exist_ok=True)
+        prefix = _export_prefix(file_path)
+        content = []
+        for index, (sheet_name, sheet_data) in enumerate(_read_sheets(file_path).items(), 1):
+            # 替换字符后不同的工作表名可能相同（如 "a b" 与 "a_b"），加上序号保证文件名唯一
+            safe_name = _UNSAFE_FILENAME_CHARS.sub("_", sheet_name)
+            data_path = write_columnar(sheet_data, Path(output_dir) / f"{prefix}.{index}-{safe_name}", fmt)
+            rows, cols = sheet_data.shape
+            content.append(f"\n### 工作表: {sheet_name}")
+            content.append(f"数据文件: {data_path} ({rows} 行 x {cols} 列, {fmt})")
+            content.append(render_dataframe(sheet_data.head(preview_rows)))
+            if rows > preview_rows:
+                content.append(f"... 仅预览前 {preview_rows} 行，完整数据见数据文件")
+        return "\n".join(content)
+    except Exception as e:
+        return f"无法导出表格文件 {file_path}: {str(e)}"
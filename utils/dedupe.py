@@ -0,0 +1,172 @@
+import hashlib
+import os
+from collections import defaultdict
+
+from utils.file_utils import get_file_content, iter_supported_files
+from utils.scanner import extract_as_scanned
+
+# 预筛选时读取文件开头和结尾的字节数
+PARTIAL_HASH_BYTES = 64 * 1024
+# 计算完整哈希时每次读取的字节数
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def _partial_hash(path, size):
+    """
+    只读取文件开头和结尾计算哈希，用于快速排除大小相同但内容不同的文件
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if size > PARTIAL_HASH_BYTES * 2:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+def _full_hash(path):
+    """
+    计算整个文件内容的哈希
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _regroup(groups, key_func):
+    """
+    将每个候选组按 key_func 继续细分，只有一个成员的组不再计算
+    """
+    result = []
+    for group in groups:
+        if len(group) == 1:
+            result.append(group)
+            continue
+        buckets = defaultdict(list)
+        for path, size in group:
+            try:
+                buckets[key_func(path, size)].append((path, size))
+            except OSError:
+                # 无法读取的文件单独成组，交给提取函数报告错误
+                buckets[("unreadable", path)].append((path, size))
+        result.extend(buckets.values())
+    return result
+
+
+def find_duplicate_groups(paths):
+    """
+    按内容和文件类型对文件分组
+
+    先按文件大小和扩展名分组，大小相同的再比较开头和结尾的部分哈希，
+    仍然相同的才计算完整哈希，大部分文件只需要一次 stat
+
+    参数:
+        paths: 文件路径的可迭代对象
+
+    返回:
+        (分组列表, 文件大小字典)；每组为内容相同的文件路径列表，
+        组的顺序和组内顺序与输入顺序一致，单独的文件自成一组
+    """
+    by_size = defaultdict(list)
+    sizes = {}
+    order = []
+    for path in paths:
+        path = str(path)
+        try:
+            size = os.path.getsize(path)
+            # 扩展名决定读取方式，内容相同但类型不同的文件（如 .csv 与 .txt）提取结果不同，不能合并
+            key = (size, os.path.splitext(path)[1].lower())
+        except OSError:
+            size = 0
+            key = ("unreadable", path)
+        sizes[path] = size
+        order.append(path)
+        by_size[key].append((path, size))
+
+    groups = list(by_size.values())
+    groups = _regroup(groups, _partial_hash)
+    groups = _regroup(groups, lambda path, size: _full_hash(path))
+
+    position = {path: i for i, path in enumerate(order)}
+    groups = [[path for path, _ in group] for group in groups]
+    groups.sort(key=lambda group: position[group[0]])
+    return groups, sizes
+
+
+def extract_unique(paths, extractor=None, workers=1):
+    """
+    每份相同内容只提取一次，结果分发给所有路径
+
+    参数:
+        paths: 文件路径的可迭代对象
+        extractor: 提取单个文件内容的函数，默认为 get_file_content
+        workers: 并行提取的文件数，大于 1 时各组的代表文件并行提取
+
+    返回:
+        (文件内容字典, 报告字典)；内容字典的键顺序与输入一致，报告包含
+        total_files、unique_files、duplicate_groups（重复文件组）和 bytes_saved
+    """
+    extractor = extractor or get_file_content
+    paths = [str(path) for path in paths]
+    groups, sizes = find_duplicate_groups(paths)
+
+    leaders = [group[0] for group in groups]
+    if workers > 1:
+        contents = dict(extract_as_scanned(leaders, extractor, workers))
+    else:
+        contents = {path: extractor(path) for path in leaders}
+
+    results = {}
+    duplicate_groups = []
+    bytes_saved = 0
+    for group in groups:
+        content = contents[group[0]]
+        for path in group:
+            results[path] = content
+        if len(group) > 1:
+            duplicate_groups.append(group)
+            bytes_saved += sizes[group[0]] * (len(group) - 1)
+
+    report = {
+        "total_files": len(paths),
+        "unique_files": len(groups),
+        "duplicate_groups": duplicate_groups,
+        "bytes_saved": bytes_saved,
+    }
+    return {path: results[path] for path in paths}, report
+
+
+def read_all_files_deduplicated(directory=".", file_extensions=None, exclude_dirs=None, extractor=None, workers=1,
+                                **filters):
+    """
+    与 read_all_files 相同，但内容相同的文件只提取一次
+
+    参数:
+        workers: 并行提取的文件数，见 extract_unique
+        filters: 扫描过滤条件，见 utils.scanner.scan_files
+
+    返回:
+        (文件内容字典, 报告字典)，报告格式见 extract_unique
+    """
+    if not os.path.exists(directory):
+        return {"错误": f"目录 {directory} 不存在"}, None
+    files = iter_supported_files(directory, file_extensions, exclude_dirs, **filters)
+    return extract_unique(files, extractor, workers)
+
+
+def format_dedupe_report(report):
+    """
+    将去重报告格式化为文本
+    """
+    lines = [
+        f"共 {report['total_files']} 个文件，内容不同的 {report['unique_files']} 个，"
+        f"跳过重复提取 {report['total_files'] - report['unique_files']} 次，"
+        f"节省 {report['bytes_saved'] / 1024 / 1024:.2f} MB"
+    ]
+    for group in report["duplicate_groups"]:
+        lines.append(f"- 重复文件组 ({len(group)} 个):")
+        for path in group:
+            lines.append(f"    {path}")
+    return "\n".join(lines)
@@ -1,15 +1,63 @@
+import codecs
+import io
+import mmap
 import os
+import re
+import threading
+import tracemalloc
 import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 import pandas as pd
+import xlrd
 from docx import Document
+from openpyxl import load_workbook
 from PyPDF2 import PdfReader
 import pdfplumber
 from pptx import Presentation
+from utils.columnar_export import export_spreadsheet
+from utils.scanner import extract_as_scanned, scan_files
+from utils.table_utils import format_cell, markdown_row, render_dataframe, render_markdown_table, write_dataframe_table
 
-# 设置最大文件处理大小 (默认为 100 MB)
-# 超过此大小的文件将被跳过，防止内存溢出
-MAX_FILE_SIZE_BYTES = 100 * 1024 * 1024
+# 设置最大文件处理大小，超过此大小的文件将被跳过 (None 表示不限制)
+# 大文件改为由大文件模式以有限内存处理，不再直接拒绝
+MAX_FILE_SIZE_BYTES = None
+
+# 超过此大小的文件进入大文件模式 (默认为 100 MB)
+# 大文件模式下使用流式/逐页读取，并在超出内存预算时截断输出
+LARGE_FILE_THRESHOLD_BYTES = 100 * 1024 * 1024
+# 大文件模式下单个任务允许增长的内存 (默认为 512 MB)
+LARGE_FILE_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+# 大文件模式下每处理多少行检查一次内存预算
+LARGE_FILE_CHECK_ROWS = 1000
+
+# Zip 压缩包递归读取限制，防止 Zip 炸弹
+# 最大嵌套层数、成员总数、解压后数据总量（嵌套压缩包累计计算）
+MAX_ZIP_DEPTH = 3
+MAX_ZIP_MEMBERS = 1000
+MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES = 512 * 1024 * 1024
+# 并行解析压缩包成员的线程数
+ZIP_EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+# 文本文件编码检测的样本大小，以及逐块解码时每块的字节数
+TEXT_SAMPLE_BYTES = 64 * 1024
+TEXT_CHUNK_BYTES = 1024 * 1024
+# 无BOM且不含零字节的样本按 UTF-16 解码后，正常文本字符达到该比例时判定为 UTF-16（只含中文的文本）
+TEXT_UTF16_CJK_RATIO = 0.9
+
+# PDF 逐页选择提取方式：内容流中直线/矩形绘制指令达到该数量的页面视为可能含表格，
+# 交给 pdfplumber 做版面分析；其余页面使用 PyPDF2 快速提取文字
+PDF_TABLE_MIN_RULINGS = 6
+# 检测表格线时递归读取表单 XObject 的最大嵌套层数
+PDF_PROBE_MAX_XOBJECT_DEPTH = 4
+# 每页走过的提取路径
+PDF_PATH_TEXT = "text"          # PyPDF2 快速提取
+PDF_PATH_TABLE = "table"        # 检测到表格线，使用 pdfplumber 提取文字和表格
+PDF_PATH_FALLBACK = "fallback"  # 首选方式失败或没有结果，改用另一种方式
+PDF_PATH_EMPTY = "empty"        # 页面没有文字绘制指令（空白页或扫描图片）
+PDF_PATH_FAILED = "failed"      # 两种方式都失败
 
 def check_file_size(file_path):
     """
@@ -17,26 +65,383 @@ def check_file_size(file_path):
     """
     try:
         size = os.path.getsize(file_path)
-        if size > MAX_FILE_SIZE_BYTES:
+        if MAX_FILE_SIZE_BYTES is not None and size > MAX_FILE_SIZE_BYTES:
             return False, f"文件过大 ({size / 1024 / 1024:.2f} MB)，超过处理限制 ({MAX_FILE_SIZE_BYTES / 1024 / 1024} MB)"
         return True, ""
     except Exception as e:
         return False, f"无法检查文件大小: {str(e)}"
 
-def read_text_file(file_path):
+
+def _current_rss_bytes():
     """
-    读取文本文件（txt, py, md, json, xml, csv等）
+    读取当前进程的匿名常驻内存 (RssAnon)，无法获取时返回 None
+
+    只统计堆等匿名内存，不包括读取文件时进入内存的文件页（页缓存可被回收），
+    否则按字节读取大文件会比预期提前一倍左右触发内存预算
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except UnicodeDecodeError:
-        # 如果UTF-8失败，尝试其他编码
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'RssAnon:'):
+                    return int(line.split()[1]) * 1024
+        # 旧内核没有 RssAnon，以常驻内存减去共享（文件映射）内存近似
+        with open('/proc/self/statm', 'rb') as f:
+            fields = f.read().split()
+        return (int(fields[1]) - int(fields[2])) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryBudget:
+    """
+    大文件模式下单个任务的内存预算
+
+    优先通过 /proc 读取进程匿名内存 (RssAnon) 的增长量，不支持的平台回退到 tracemalloc 统计。
+    这是进程级指标，多线程并行处理时预算为近似值。
+
+    用法:
+        with MemoryBudget() as budget:
+            ...
+            if budget.exceeded():
+                content.append(budget.truncation_note())
+                break
+    """
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = LARGE_FILE_MEMORY_BUDGET_BYTES if limit_bytes is None else limit_bytes
+        self.truncated = False
+        self._baseline = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        self._baseline = _current_rss_bytes()
+        if self._baseline is None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return False
+
+    def used(self):
+        """
+        返回自预算开始以来增长的内存字节数
+        """
+        if self._baseline is not None:
+            rss = _current_rss_bytes()
+            if rss is not None:
+                return max(rss - self._baseline, 0)
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return 0
+
+    def exceeded(self):
+        """
+        检查是否超出预算，超出后标记为已截断
+        """
+        if self.used() > self.limit_bytes:
+            self.truncated = True
+        return self.truncated
+
+    def truncation_note(self):
+        return f"[内容已截断: 超出大文件模式内存预算 ({self.limit_bytes / 1024 / 1024:.0f} MB)]"
+
+# 无BOM文本依次尝试的编码：检测结果在解码后文中遇到非法字节时换用下一个
+_TEXT_FALLBACK_ENCODINGS = ('utf-8', 'gbk', 'gb18030')
+
+# 无BOM UTF-16 判断时视为正常文本的字符：中日韩汉字、中文标点、全角字符和可打印 ASCII
+_CJK_TEXT_CHARS = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef\t\n\r\x20-\x7e]')
+
+# BOM 与对应编码，UTF-8 BOM 需排在 UTF-16 之前判断
+_TEXT_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+
+def detect_encoding(sample):
+    """
+    根据文件开头的样本字节推断文本编码
+
+    支持 UTF-8、UTF-8-BOM、UTF-16（带或不带BOM）、GBK 和 GB18030，
+    都无法严格解码时回退为 UTF-8；样本之后的内容仍可能不符合该编码，见 read_text_file
+    """
+    sample = bytes(sample)
+    for bom, encoding in _TEXT_BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # 无BOM的UTF-16：ASCII字符的高位字节为0，集中出现在奇数或偶数位置
+    if len(sample) >= 4:
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_zeros > half * 0.3 and even_zeros < half * 0.05:
+            return 'utf-16-le'
+        if even_zeros > half * 0.3 and odd_zeros < half * 0.05:
+            return 'utf-16-be'
+
+    # 样本末尾可能截断在多字节字符中间，使用增量解码器且不结束输入
+    for encoding in _TEXT_FALLBACK_ENCODINGS:
+        if encoding == 'gbk':
+            # 只含中文的无BOM UTF-16 没有零字节，但大多能按 GBK 解码，需在 GBK 之前判断
+            utf16 = _detect_cjk_utf16(sample)
+            if utf16:
+                return utf16
         try:
-            with open(file_path, 'r', encoding='gbk') as file:
-                return file.read()
-        except:
-            return f"无法解码文件 {file_path}: 文件编码不支持"
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'utf-8'
+
+
+def _detect_cjk_utf16(sample):
+    """
+    按 UTF-16 解码样本，绝大多数字符为中文、中文标点或可打印 ASCII 时返回对应的编码
+
+    GB2312 汉字的两个字节都不小于 0xA1，按 UTF-16 解码会落在韩文、代理区和私用区，不会被误判
+    """
+    sample = sample[:len(sample) - len(sample) % 2]
+    if len(sample) < 4:
+        return None
+    for encoding in ('utf-16-le', 'utf-16-be'):
+        text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample)
+        plausible = len(_CJK_TEXT_CHARS.findall(text))
+        if plausible >= len(text) * TEXT_UTF16_CJK_RATIO:
+            return encoding
+    return None
+
+
+class _FileWindowView:
+    """
+    按需 seek + read 的只读文件视图，切片接口与内存映射相同，但不映射整个文件
+
+    大文件模式使用：内存映射读入的页会计入进程 RSS，并占用与文件大小相同的地址空间，
+    在 RLIMIT_AS 限制下映射大文件会直接失败
+    """
+    def __init__(self, file):
+        self._file = file
+        self._size = os.fstat(file.fileno()).st_size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self._size)
+            self._file.seek(start)
+            return self._file.read(max(stop - start, 0))
+        self._file.seek(key)
+        return self._file.read(1)[0]
+
+
+@contextmanager
+def _open_text_buffer(file_path, windowed=False):
+    """
+    以只读内存映射方式打开文件，返回可切片的缓冲区；内存流直接返回其底层缓冲区
+
+    windowed 为 True 时不建立内存映射，每次切片只读取对应的字节
+    """
+    if hasattr(file_path, 'getbuffer'):
+        with file_path.getbuffer() as buffer:
+            yield buffer
+        return
+
+    with open(file_path, 'rb') as file:
+        if windowed:
+            yield _FileWindowView(file)
+            return
+        if os.fstat(file.fileno()).st_size == 0:
+            # 空文件无法建立内存映射
+            yield b''
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def _align_text_offset(buffer, offset, encoding):
+    """
+    将字节偏移对齐到字符边界，避免从多字节字符中间开始解码
+    """
+    if encoding.startswith('utf-16'):
+        return offset - offset % 2
+    if encoding.startswith('utf-8'):
+        # 跳过UTF-8的后续字节(10xxxxxx)
+        limit = min(offset + 3, len(buffer))
+        while offset < limit and 0x80 <= buffer[offset] <= 0xBF:
+            offset += 1
+    # GBK/GB18030 不具备自同步性，无法可靠对齐，首个字符可能被替换
+    return offset
+
+
+def iter_text_chunks(file_path, chunk_size=TEXT_CHUNK_BYTES, encoding=None, start=0, end=None, windowed=False):
+    """
+    以内存映射方式逐块解码文本文件，内存占用与块大小相关而与文件大小无关
+
+    未指定编码且检测为 UTF-8/GBK 时严格解码，遇到不符合该编码的字节（例如开头全是 ASCII、
+    后面才出现 GBK 中文）从该字节所在行起换用下一个后备编码继续解码，已解码的部分不再重复解码；
+    所有后备编码都失败时才以替换字符处理非法字节
+
+    参数:
+        file_path: 文件路径或内存二进制流
+        chunk_size: 每次解码的字节数，None表示整个区间一次解码
+        encoding: 指定编码，None表示根据文件开头自动检测
+        start: 起始字节偏移
+        end: 结束字节偏移（不含），None表示文件末尾
+        windowed: 不建立内存映射，逐块读取（大文件模式使用）
+
+    返回:
+        生成器，逐块产出解码后的字符串，换行符统一为 "\n"
+    """
+    with _open_text_buffer(file_path, windowed) as buffer:
+        size = len(buffer)
+        if encoding is None:
+            encoding = detect_encoding(buffer[:TEXT_SAMPLE_BYTES])
+            candidates = list(_TEXT_FALLBACK_ENCODINGS[_TEXT_FALLBACK_ENCODINGS.index(encoding):]) \
+                if encoding in _TEXT_FALLBACK_ENCODINGS else [encoding]
+        else:
+            candidates = [encoding]
+
+        # BOM 只在文件开头，按偏移跳过后使用不带BOM的编解码器
+        bom_length = 0
+        for bom, bom_encoding in _TEXT_BOMS:
+            if bom_encoding == encoding and buffer[:len(bom)] == bom:
+                bom_length = len(bom)
+        codec = 'utf-8' if encoding == 'utf-8-sig' else encoding
+
+        end = size if end is None else min(max(end, 0), size)
+        start = max(start, bom_length)
+        if start > bom_length:
+            start = _align_text_offset(buffer, start, codec)
+        chunk_size = chunk_size or max(end - start, 1)
+
+        if len(candidates) == 1:
+            texts = _iter_decoded(buffer, start, end, codec, chunk_size, size)
+        else:
+            texts = _iter_decoded_with_fallback(buffer, start, end, candidates, chunk_size)
+
+        pending_cr = ''
+        for text in texts:
+            # 与文本模式 open() 一致的通用换行处理，块末尾的 \r 留到下一块与 \n 合并
+            text = pending_cr + text if pending_cr else text
+            pending_cr = ''
+            if text.endswith('\r'):
+                text, pending_cr = text[:-1], '\r'
+            # 先用 in 快速判断，不含 \r 时跳过两遍替换
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            if text:
+                yield text
+        if pending_cr:
+            yield '\n'
+
+
+def _iter_decoded(buffer, start, end, codec, chunk_size, size):
+    """
+    以增量解码器逐块解码，非法字节替换为替换字符
+    """
+    decoder = codecs.getincrementaldecoder(codec)(errors='replace')
+    for offset in range(start, end, chunk_size):
+        yield decoder.decode(buffer[offset:min(offset + chunk_size, end)])
+    # 区间在文件中间结束时，末尾被截断的不完整字符直接丢弃
+    if end == size:
+        yield decoder.decode(b'', final=True)
+
+
+# 切分解码块时可作为分界的字节：空白字节不会出现在 UTF-8/GBK/GB18030 多字节字符内部
+_TEXT_BREAK_BYTES = (b'\n', b'\r', b' ', b'\t')
+
+
+def _iter_decoded_with_fallback(buffer, start, end, candidates, chunk_size):
+    """
+    逐块严格解码，块在空白字节之后切分，使每块都能独立解码；state 记录当前使用的编码，
+    换用后备编码后后续各块直接使用新编码
+    """
+    state = [0]
+    offset = start
+    while offset < end:
+        stop = min(offset + chunk_size, end)
+        if stop < end:
+            tail = bytes(buffer[max(stop - TEXT_SAMPLE_BYTES, offset):stop])
+            cut = max(tail.rfind(byte) for byte in _TEXT_BREAK_BYTES)
+            if cut >= 0:
+                stop = stop - len(tail) + cut + 1
+        yield from _decode_block(buffer, offset, stop, candidates, state)
+        offset = stop
+
+
+def _decode_block(buffer, start, end, candidates, state):
+    """
+    严格解码 [start, end) 字节，失败时从非法字节所在行起换用下一个编码，返回解码后的字符串列表
+    """
+    texts = []
+    # 内存映射和 bytes 通过 memoryview 切片，不复制整个区间
+    data = memoryview(buffer)[start:end] if not isinstance(buffer, _FileWindowView) else buffer[start:end]
+    try:
+        pos = 0
+        while True:
+            encoding = candidates[state[0]]
+            try:
+                texts.append(str(data[pos:], encoding))
+                return texts
+            except UnicodeDecodeError as e:
+                failed = pos + e.start
+            if state[0] + 1 == len(candidates):
+                texts.append(str(data[pos:], encoding, 'replace'))
+                return texts
+            # 非法字节之前的部分按当前编码有效，从所在行的开头换用下一个编码
+            search_from = max(failed - TEXT_SAMPLE_BYTES, pos)
+            newline = bytes(data[search_from:failed]).rfind(b'\n')
+            switch = search_from + newline + 1 if newline >= 0 else failed
+            texts.append(str(data[pos:switch], encoding))
+            pos = switch
+            state[0] += 1
+    finally:
+        # 释放对内存映射的引用，否则映射无法关闭
+        if isinstance(data, memoryview):
+            data.release()
+
+
+def read_text_file(file_path, head=None, tail=None, byte_range=None, budget=None):
+    """
+    读取文本文件（txt, py, md, json, xml, csv等）
+
+    通过内存映射单遍解码，编码根据文件开头的样本自动检测；样本之后出现不符合该编码的字节时
+    从该字节所在行起换用下一个后备编码继续解码，见 iter_text_chunks
+
+    参数:
+        file_path: 文件路径或内存二进制流
+        head: 只读取开头的字节数
+        tail: 只读取末尾的字节数
+        byte_range: 只读取 (起始, 结束) 字节区间
+        budget: 大文件模式的内存预算 (MemoryBudget)，超出时截断；此时逐块读取而不建立内存映射
+    """
+    try:
+        windowed = budget is not None
+        start, end = 0, None
+        if byte_range is not None:
+            start, end = byte_range
+        elif head is not None:
+            end = head
+        elif tail is not None:
+            with _open_text_buffer(file_path, windowed) as buffer:
+                start = max(len(buffer) - tail, 0)
+
+        if budget is None:
+            # 整个区间一次解码，避免逐块解码再拼接
+            return "".join(iter_text_chunks(file_path, chunk_size=None, start=start, end=end))
+
+        content = []
+        for chunk in iter_text_chunks(file_path, start=start, end=end, windowed=True):
+            content.append(chunk)
+            if budget.exceeded():
+                content.append(f"\n{budget.truncation_note()}")
+                break
+        return "".join(content)
     except Exception as e:
         return f"无法读取文件 {file_path}: {str(e)}"
 
@@ -57,37 +462,11 @@ def read_docx_file(file_path):
             if not table.rows:
                 continue
                 
-            # 提取所有行的数据
-            rows_data = []
-            for row in table.rows:
-                row_text = [cell.text.strip().replace('\n', '<br>') for cell in row.cells]
-                rows_data.append(row_text)
-            
-            if not rows_data:
-                continue
-
-            # 确定列数（取最大列数）
-            max_cols = max(len(row) for row in rows_data)
-            
-            # 补齐每一行的列数
-            for i in range(len(rows_data)):
-                while len(rows_data[i]) < max_cols:
-                    rows_data[i].append("")
+            # 提取所有行的数据，第一行作为表头，列数不一致时由渲染函数补齐
+            rows_data = [[cell.text for cell in row.cells] for row in table.rows]
             
             content.append("\n") # 表格前空行
-            
-            # 生成 Markdown 表格
-            # 1. 表头
-            header = rows_data[0]
-            content.append("| " + " | ".join(header) + " |")
-            
-            # 2. 分隔线
-            content.append("| " + " | ".join(["---"] * max_cols) + " |")
-            
-            # 3. 数据行 (从第二行开始，如果有的话)
-            for row in rows_data[1:]:
-                content.append("| " + " | ".join(row) + " |")
-            
+            content.append(render_markdown_table(rows_data))
             content.append("\n") # 表格后空行
         
         return "\n".join(content)
@@ -95,84 +474,263 @@ def read_docx_file(file_path):
         return f"无法读取Word文档 {file_path}: {str(e)}"
 
 
-def read_pdf_file(file_path):
+# 直线 (l) 和矩形 (re) 绘制指令，表格的框线通常由它们组成
+_PDF_RULING_OPERATORS = re.compile(rb'(?<!\S)(?:re|l)(?!\S)')
+# 文字绘制指令
+_PDF_TEXT_OPERATORS = re.compile(rb'(?<![^\s)\]>])T[jJ](?![^\s\[/(<])')
+
+# 本进程累计的各提取路径页数，见 pdf_strategy_stats
+_pdf_strategy_counts = Counter()
+_pdf_strategy_lock = threading.Lock()
+
+
+def pdf_strategy_stats():
+    """
+    返回本进程内 PDF 各提取路径累计处理的页数
+    """
+    with _pdf_strategy_lock:
+        return dict(_pdf_strategy_counts)
+
+
+def _iter_form_xobjects(resources, seen, depth=0):
+    """
+    遍历资源字典中的表单 XObject（含嵌套的表单），产出其内容流数据
+
+    表格常被绘制在表单 XObject 中再由页面的 Do 指令引用，只读页面自身的内容流会漏掉
+    """
+    if resources is None or depth > PDF_PROBE_MAX_XOBJECT_DEPTH:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return
+    for reference in xobjects.get_object().values():
+        key = getattr(reference, "idnum", None) or id(reference)
+        if key in seen:
+            continue
+        seen.add(key)
+        xobject = reference.get_object()
+        if xobject.get("/Subtype") != "/Form":
+            continue
+        yield xobject.get_data()
+        yield from _iter_form_xobjects(xobject.get("/Resources"), seen, depth + 1)
+
+
+def _probe_pdf_page(page):
+    """
+    读取页面的原始内容流和其引用的表单 XObject（不做版面分析），
+    返回 (直线/矩形指令数, 是否有文字绘制指令)
+    """
+    streams = []
+    contents = page.get_contents()
+    if contents is not None:
+        streams.append(contents.get_data())
+    streams.extend(_iter_form_xobjects(page.get("/Resources"), set()))
+
+    rulings = 0
+    has_text = False
+    for data in streams:
+        rulings += len(_PDF_RULING_OPERATORS.findall(data))
+        has_text = has_text or _PDF_TEXT_OPERATORS.search(data) is not None
+    return rulings, has_text
+
+
+def _read_pdf_page_with_pdfplumber(pdf, index):
+    """
+    使用 pdfplumber 提取单页的文字和表格，返回内容片段列表
+    """
+    page = pdf.pages[index]
+    try:
+        parts = []
+        text = page.extract_text()
+        if text and text.strip():
+            parts.append(text.strip())
+
+        for table in page.extract_tables() or []:
+            # 过滤全空的行（None 值视为空）
+            cleaned_table = [row for row in table if any(row)]
+            if cleaned_table:
+                # 转换为 Markdown 表格，列数不一致时自动补齐
+                parts.append(render_markdown_table(cleaned_table))
+        return parts
+    finally:
+        # 释放页面解析缓存，避免所有页面的布局对象同时驻留内存
+        page.close()
+
+
+def _read_pdf_page_with_pypdf2(reader, index):
     """
-    读取PDF文件 - 使用pdfplumber作为主要的PDF读取工具，PyPDF2作为备选
+    使用 PyPDF2 提取单页文字，返回内容片段列表
+    """
+    text = reader.pages[index].extract_text()
+    return [text.strip()] if text and text.strip() else []
+
+
+def read_pdf_file(file_path, budget=None, stats=None):
+    """
+    读取PDF文件 - 逐页选择提取方式
+
+    先用 PyPDF2 读取每页的原始内容流（含引用的表单 XObject）：含表格线的页面使用 pdfplumber
+    提取文字和表格，其余页面直接使用 PyPDF2 提取文字；某一页的首选方式失败或没有结果时，
+    只对该页改用另一种方式。pdfplumber 只在需要时打开，纯文字的PDF不会承担版面分析的开销。
+
+    只以表格线判断，不使用文字密度和页数：文字多少不决定是否需要版面分析，而是否有文字
+    已用于识别空白/扫描页；选择按页进行，页数不影响单页的选择。没有框线、只靠对齐排版的
+    表格会走文字路径，表格内容仍以文字形式输出。
+
+    逐页处理并在每页结束后释放页面缓存；传入 budget 时超出内存预算即停止
+
+    参数:
+        stats: 可选的字典，写入本文件各提取路径的页数（见 PDF_PATH_*）
     """
     content = []
+    counts = Counter()
+    pypdf2_error = None
     pdfplumber_error = None
-    
-    # 首先尝试使用pdfplumber读取PDF
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                try:
-                    text = page.extract_text()
-                    if text and text.strip():
-                        content.append(f"### 第{page_num}页")
-                        content.append(text.strip())
-                    
-                    # 尝试提取表格
-                    tables = page.extract_tables()
-                    if tables:
-                        for table in tables:
-                            # 过滤空行
-                            cleaned_table = []
-                            for row in table:
-                                # 处理 None 值
-                                cleaned_row = [cell.replace('\n', '<br>') if cell else "" for cell in row]
-                                if any(cleaned_row): # 如果行不全为空
-                                    cleaned_table.append(cleaned_row)
-                            
-                            if not cleaned_table:
-                                continue
-                                
-                            # 转换为 Markdown 表格
-                            try:
-                                df_table = pd.DataFrame(cleaned_table[1:], columns=cleaned_table[0])
-                                content.append(df_table.to_markdown(index=False))
-                            except:
-                                # 如果 DataFrame 转换失败（例如列数不一致），简单拼接
-                                for row in cleaned_table:
-                                    content.append("| " + " | ".join(row) + " |")
-
-                except Exception as e:
-                    content.append(f"无法提取第{page_num}页内容: {str(e)}")
-            
-            if content:  # 如果pdfplumber成功读取到内容
-                return "\n\n".join(content)
-    except Exception as e:
-        pdfplumber_error = e
-        pass  # pdfplumber失败，继续尝试其他方法
-    
-    # 备选方案：使用PyPDF2
+    pdf = None
+
+    def open_pdfplumber():
+        # pdfplumber 打开失败后不再重试
+        nonlocal pdf, pdfplumber_error
+        if pdf is None and pdfplumber_error is None:
+            try:
+                pdf = pdfplumber.open(file_path)
+            except Exception as e:
+                pdfplumber_error = e
+        if pdf is None:
+            raise pdfplumber_error
+        return pdf
+
     try:
-        reader = PdfReader(file_path)
-        for page_num, page in enumerate(reader.pages, 1):
+        try:
+            reader = PdfReader(file_path)
+            page_count = len(reader.pages)
+        except Exception as e:
+            # PyPDF2 无法解析时所有页面交给 pdfplumber
+            reader = None
+            pypdf2_error = e
+            page_count = len(open_pdfplumber().pages)
+
+        for index in range(page_count):
+            page_num = index + 1
+            parts = []
+            path = PDF_PATH_TABLE
             try:
-                text = page.extract_text()
-                if text and text.strip():
-                    content.append(f"### 第{page_num}页")
-                    content.append(text.strip())
+                if reader is not None:
+                    try:
+                        rulings, has_text = _probe_pdf_page(reader.pages[index])
+                    except Exception:
+                        # 无法读取内容流时按含表格处理
+                        rulings, has_text = PDF_TABLE_MIN_RULINGS, True
+                    if rulings < PDF_TABLE_MIN_RULINGS:
+                        try:
+                            parts = _read_pdf_page_with_pypdf2(reader, index)
+                        except Exception:
+                            parts = []
+                        if parts:
+                            path = PDF_PATH_TEXT
+                        elif has_text:
+                            # 有文字绘制指令却没有提取到文字，改用 pdfplumber
+                            path = PDF_PATH_FALLBACK
+                        else:
+                            path = PDF_PATH_EMPTY
+
+                if path in (PDF_PATH_TABLE, PDF_PATH_FALLBACK):
+                    try:
+                        parts = _read_pdf_page_with_pdfplumber(open_pdfplumber(), index)
+                    except Exception:
+                        if reader is None or path == PDF_PATH_FALLBACK:
+                            raise
+                        # 表格页的 pdfplumber 提取失败，退回 PyPDF2 提取文字
+                        path = PDF_PATH_FALLBACK
+                        parts = _read_pdf_page_with_pypdf2(reader, index)
             except Exception as e:
-                content.append(f"无法提取第{page_num}页内容: {str(e)}")
-        
-        if content:
-            return "\n\n".join(content)
-        else:
-            return f"PDF文件 {file_path} 内容为空或无法提取文本"
-    except Exception as pypdf2_error:
-        if pdfplumber_error:
-            return f"无法读取PDF文件 {file_path} (pdfplumber: {str(pdfplumber_error)}, PyPDF2: {str(pypdf2_error)})"
-        else:
-            return f"无法读取PDF文件 {file_path} (PyPDF2: {str(pypdf2_error)})"
+                path = PDF_PATH_FAILED
+                parts = [f"无法提取第{page_num}页内容: {str(e)}"]
+
+            counts[path] += 1
+            if parts:
+                content.append(f"### 第{page_num}页")
+                content.extend(parts)
+
+            if budget is not None and budget.exceeded():
+                content.append(budget.truncation_note())
+                break
+    except Exception as e:
+        if pypdf2_error is not None:
+            return f"无法读取PDF文件 {file_path} (pdfplumber: {str(e)}, PyPDF2: {str(pypdf2_error)})"
+        return f"无法读取PDF文件 {file_path}: {str(e)}"
+    finally:
+        if pdf is not None:
+            pdf.close()
+        with _pdf_strategy_lock:
+            _pdf_strategy_counts.update(counts)
+        if stats is not None:
+            stats.update(counts)
+
+    if content:
+        return "\n\n".join(content)
+    return f"PDF文件 {file_path} 内容为空或无法提取文本"
+
+
+def _stream_rows_to_markdown(rows, content, budget):
+    """
+    将逐行产出的表格数据写为 Markdown 表格，以第一个非空行作为表头
+
+    每处理 LARGE_FILE_CHECK_ROWS 行检查一次内存预算，超出时截断并返回 False
+    """
+    header_cols = 0
+    for row_num, row in enumerate(rows, 1):
+        cells = [format_cell(value) for value in row]
+        # 去掉行尾的空单元格，再按表头列数补齐
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        cells.extend([""] * (header_cols - len(cells)))
+        content.append(markdown_row(cells))
+        if not header_cols:
+            header_cols = len(cells)
+            content.append(markdown_row(["---"] * header_cols))
+
+        if row_num % LARGE_FILE_CHECK_ROWS == 0 and budget.exceeded():
+            content.append(budget.truncation_note())
+            return False
+    return True
+
+
+def _read_xls_file_streaming(file_path, budget):
+    """
+    大文件模式下逐个工作表读取旧版Excel文件，读完即卸载工作表
+    """
+    content = []
+    if hasattr(file_path, 'getvalue'):
+        book = xlrd.open_workbook(file_contents=file_path.getvalue(), on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        for sheet_name in book.sheet_names():
+            sheet = book.sheet_by_name(sheet_name)
+            content.append(f"\n### 工作表: {sheet_name}")
+            rows = (sheet.row_values(i) for i in range(sheet.nrows))
+            completed = _stream_rows_to_markdown(rows, content, budget)
+            book.unload_sheet(sheet_name)
+            if not completed:
+                break
+    finally:
+        book.release_resources()
+    return "\n".join(content)
 
 
-def read_xls_file(file_path):
+def read_xls_file(file_path, budget=None):
     """
     读取旧版Excel文件（.xls）
+
+    传入 budget 时进入大文件模式，逐个工作表流式输出并在超出内存预算时截断
     """
     try:
+        if budget is not None:
+            return _read_xls_file_streaming(file_path, budget)
+
         # 使用pandas读取.xls文件，header=None 避免将第一行空行误认为表头
         df = pd.read_excel(file_path, sheet_name=None, engine='xlrd', header=None)
         content = []
@@ -186,30 +744,44 @@ def read_xls_file(file_path):
             sheet_data = sheet_data.fillna('')
             
             content.append(f"\n### 工作表: {sheet_name}")
-            # 使用 markdown 格式输出
-            try:
-                # 尝试将第一行作为表头
-                if len(sheet_data) > 0:
-                    new_header = sheet_data.iloc[0]
-                    sheet_data = sheet_data[1:]
-                    sheet_data.columns = new_header
-                    content.append(sheet_data.to_markdown(index=False))
-                else:
-                    content.append(sheet_data.to_markdown(index=False))
-            except ImportError:
-                # 如果没有安装 tabulate，回退到 to_string
-                content.append(sheet_data.to_string(index=False, header=False))
+            # 使用 markdown 格式输出，尝试将第一行作为表头
+            if len(sheet_data) > 0:
+                new_header = sheet_data.iloc[0]
+                sheet_data = sheet_data[1:]
+                sheet_data.columns = new_header
+            content.append(render_dataframe(sheet_data))
         
         return "\n".join(content)
     except Exception as e:
         return f"无法读取Excel文件 {file_path}: {str(e)}"
 
 
-def read_excel_file(file_path):
+def _read_excel_file_streaming(file_path, budget):
+    """
+    大文件模式下以只读模式逐行读取Excel文件，不将整个工作簿载入内存
+    """
+    content = []
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            content.append(f"\n### 工作表: {sheet.title}")
+            if not _stream_rows_to_markdown(sheet.iter_rows(values_only=True), content, budget):
+                break
+    finally:
+        workbook.close()
+    return "\n".join(content)
+
+
+def read_excel_file(file_path, budget=None):
     """
     读取Excel文件（.xlsx, .xls）
+
+    传入 budget 时进入大文件模式，逐行流式输出并在超出内存预算时截断
     """
     try:
+        if budget is not None:
+            return _read_excel_file_streaming(file_path, budget)
+
         # 使用pandas读取Excel文件，header=None 避免将第一行空行误认为表头
         df = pd.read_excel(file_path, sheet_name=None, header=None)  # 读取所有工作表
         content = []
@@ -224,23 +796,18 @@ def read_excel_file(file_path):
             
             content.append(f"\n### 工作表: {sheet_name}")
             # 使用 markdown 格式输出
-            try:
-                # 尝试将第一行作为表头，这样表格更好看
-                if len(sheet_data) > 0:
-                    # 检查第一行是否适合做表头（非空）
-                    first_row = sheet_data.iloc[0].astype(str)
-                    if not first_row.str.contains('^$').all():
-                        new_header = first_row
-                        sheet_data_content = sheet_data[1:].copy()
-                        sheet_data_content.columns = new_header
-                        content.append(sheet_data_content.to_markdown(index=False))
-                    else:
-                         content.append(sheet_data.to_markdown(index=False, header=False))
+            # 尝试将第一行作为表头，这样表格更好看
+            if len(sheet_data) > 0:
+                # 检查第一行是否适合做表头（非空）
+                first_row = sheet_data.iloc[0].astype(str)
+                if not first_row.str.contains('^$').all():
+                    sheet_data_content = sheet_data[1:].copy()
+                    sheet_data_content.columns = sheet_data.iloc[0]
+                    content.append(render_dataframe(sheet_data_content))
                 else:
-                    content.append(sheet_data.to_markdown(index=False))
-            except ImportError:
-                # 如果没有安装 tabulate，回退到 to_string
-                content.append(sheet_data.to_string(index=False, header=False))
+                    content.append(render_dataframe(sheet_data, header=False))
+            else:
+                content.append(render_dataframe(sheet_data))
         
         return "\n".join(content)
     except Exception as e:
@@ -277,38 +844,16 @@ def read_powerpoint_file(file_path):
                         row_text = []
                         for cell in row.cells:
                             if hasattr(cell, "text_frame") and cell.text_frame.text:
-                                row_text.append(cell.text_frame.text.strip().replace('\n', '<br>'))
+                                row_text.append(cell.text_frame.text)
                             else:
                                 row_text.append("")
                         rows_data.append(row_text)
                     
-                    if not rows_data:
-                        continue
-                        
-                    # 确定列数
-                    max_cols = max(len(row) for row in rows_data)
-                    if max_cols == 0:
+                    if not any(rows_data):
                         continue
-                        
-                    # 补齐每一行的列数
-                    for i in range(len(rows_data)):
-                        while len(rows_data[i]) < max_cols:
-                            rows_data[i].append("")
                     
                     content.append("\n") # 表格前空行
-                    
-                    # 生成 Markdown 表格
-                    # 表头
-                    header = rows_data[0]
-                    content.append("| " + " | ".join(header) + " |")
-                    
-                    # 分隔线
-                    content.append("| " + " | ".join(["---"] * max_cols) + " |")
-                    
-                    # 数据行
-                    for row in rows_data[1:]:
-                        content.append("| " + " | ".join(row) + " |")
-                    
+                    content.append(render_markdown_table(rows_data))
                     content.append("\n") # 表格后空行
 
         return "\n".join(content)
@@ -316,27 +861,124 @@ def read_powerpoint_file(file_path):
         return f"无法读取PowerPoint文件 {file_path}: {str(e)}"
 
 
-def read_csv_file(file_path):
+def _read_csv_file_streaming(file_path, budget):
+    """
+    大文件模式下分块读取CSV文件，每块单独转换后拼接为同一个 Markdown 表格
+    """
+    out = io.StringIO()
+    for chunk_num, chunk in enumerate(pd.read_csv(file_path, chunksize=LARGE_FILE_CHECK_ROWS * 10)):
+        # 后续块接续同一个表格，不再重复表头和分隔线
+        write_dataframe_table(chunk, out, continuation=chunk_num > 0)
+        if budget.exceeded():
+            out.write(budget.truncation_note())
+            break
+    return out.getvalue().rstrip("\n")
+
+
+def read_csv_file(file_path, budget=None):
     """
     读取CSV文件
+
+    传入 budget 时进入大文件模式，分块读取并在超出内存预算时截断
     """
     try:
+        if budget is not None:
+            return _read_csv_file_streaming(file_path, budget)
+
         df = pd.read_csv(file_path)
-        try:
-            return df.to_markdown(index=False)
-        except ImportError:
-            return df.to_string(index=False)
+        return render_dataframe(df)
     except Exception as e:
         return f"无法读取CSV文件 {file_path}: {str(e)}"
 
 
-def read_zip_file(file_path):
+class _ZipMemberStream(io.BytesIO):
     """
-    读取Zip文件，尝试识别为Office文档，否则列出内容
+    压缩包成员的内存流，打印时显示为 "压缩包!成员"，便于各读取函数输出可读的错误信息
+    """
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class _ZipBudget:
+    """
+    一次压缩包读取（含嵌套压缩包）共享的资源预算，用于防御 Zip 炸弹
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.members = 0
+        self.bytes_left = MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES
+
+    def reserve_member(self):
+        with self.lock:
+            if self.members >= MAX_ZIP_MEMBERS:
+                return False
+            self.members += 1
+            return True
+
+    def reserve_bytes(self, size):
+        with self.lock:
+            if size > self.bytes_left:
+                return False
+            self.bytes_left -= size
+            return True
+
+
+def _read_zip_member(z, info, archive_name, depth, budget, member_prefix=""):
+    """
+    从压缩流中直接读取单个成员并交给对应的读取函数，不解压到磁盘
+    """
+    member_name = f"{archive_name}!{info.filename}"
+    handler = get_file_handler(info.filename, default=None)
+    if handler is None:
+        return "(不支持的文件类型，已跳过)"
+    if info.flag_bits & 0x1:
+        return "(成员已加密，已跳过)"
+    if not budget.reserve_member():
+        return f"(成员数量超过限制 {MAX_ZIP_MEMBERS}，已跳过)"
+    # 先按声明大小预留，实际读取时再以预留额度为上限，防止伪造的头部信息
+    if not budget.reserve_bytes(info.file_size):
+        return f"(解压总大小超过限制 {MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES / 1024 / 1024} MB，已跳过)"
+
+    with z.open(info) as f:
+        data = f.read(info.file_size + 1)
+    if len(data) > info.file_size:
+        return "(成员实际大小与声明不符，疑似Zip炸弹，已跳过)"
+
+    if handler is read_zip_file:
+        # 嵌套压缩包在当前线程内顺序展开，共享同一份预算
+        return read_zip_file(
+            _ZipMemberStream(data, member_name), depth=depth + 1, budget=budget, workers=1,
+            member_prefix=f"{member_prefix}{info.filename}!",
+        )
+    return handler(_ZipMemberStream(data, member_name))
+
+
+def read_zip_file(file_path, depth=0, budget=None, workers=None, member_prefix=""):
+    """
+    读取Zip文件，尝试识别为Office文档，否则递归提取其中所有支持的文件内容
+
+    参数:
+        file_path: Zip文件路径或已打开的二进制流
+        depth: 当前嵌套深度，超过 MAX_ZIP_DEPTH 的嵌套压缩包不再展开
+        budget: 嵌套读取时共享的资源预算，默认新建
+        workers: 并行解析成员的线程数，默认为 ZIP_EXTRACT_WORKERS
+        member_prefix: 嵌套压缩包在外层中的路径（如 "inner.zip!"），加在成员标题前，
+            使 iter_sections 能区分不同层级的同名成员
     """
     try:
         if not zipfile.is_zipfile(file_path):
              return f"不是有效的Zip文件: {file_path}"
+        if depth > MAX_ZIP_DEPTH:
+            return f"嵌套层数超过限制 ({MAX_ZIP_DEPTH})，未展开: {file_path}"
+
+        if budget is None:
+            budget = _ZipBudget()
+        if workers is None:
+            workers = ZIP_EXTRACT_WORKERS
              
         with zipfile.ZipFile(file_path, 'r') as z:
             file_list = z.namelist()
@@ -353,33 +995,107 @@ def read_zip_file(file_path):
             if 'ppt/presentation.xml' in file_list:
                 return read_powerpoint_file(file_path)
                 
-            # 如果不是Office文档，列出文件
-            content = [f"Zip文件包含 {len(file_list)} 个文件:"]
-            for name in file_list:
-                # 跳过目录
-                if name.endswith('/'):
-                    continue
-                    
-                content.append(f"- {name}")
-                
-                # 尝试读取文本文件内容
-                if name.lower().endswith(('.txt', '.md', '.json', '.xml', '.py', '.csv', '.log')):
+            # 如果不是Office文档，列出文件并提取每个成员
+            members = [info for info in z.infolist() if not info.is_dir()]
+            content = [f"Zip文件包含 {len(members)} 个文件:"]
+            for info in members:
+                content.append(f"- {info.filename}")
+
+            # 各成员在线程池中并行解析，ZipFile 内部对底层文件的读取有锁保护
+            archive_name = str(file_path)
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = [
+                    executor.submit(_read_zip_member, z, info, archive_name, depth, budget, member_prefix)
+                    for info in members
+                ]
+                for info, future in zip(members, futures):
                     try:
-                        with z.open(name) as f:
-                            # 限制读取大小
-                            text = f.read(2000).decode('utf-8', errors='ignore')
-                            content.append(f"  内容预览:\n{text[:500]}...")
-                    except:
-                        pass
+                        member_content = future.result()
+                    except Exception as e:
+                        member_content = f"无法读取压缩包成员 {info.filename}: {str(e)}"
+                    content.append(f"\n## 压缩包成员: {member_prefix}{info.filename}")
+                    content.append(str(member_content))
             
             return "\n".join(content)
     except Exception as e:
         return f"无法读取Zip文件 {file_path}: {str(e)}"
 
 
-def get_file_content(file_path):
+# 定义支持的文件类型
+FILE_HANDLERS = {
+    # 文本文件
+    '.txt': read_text_file,
+    '.py': read_text_file,
+    '.md': read_text_file,
+    '.json': read_text_file,
+    '.xml': read_text_file,
+    '.html': read_text_file,
+    '.css': read_text_file,
+    '.js': read_text_file,
+    '.log': read_text_file,
+    '.ini': read_text_file,
+    '.cfg': read_text_file,
+    '.conf': read_text_file,
+    
+    # Word文档
+    '.docx': read_docx_file,
+    
+    # PDF文件
+    '.pdf': read_pdf_file,
+    
+    # Excel文件 - 新版.xlsx
+    '.xlsx': read_excel_file,
+    # Excel文件 - 旧版.xls
+    '.xls': read_xls_file,
+    
+    # PowerPoint文件
+    '.pptx': read_powerpoint_file,
+    
+    # CSV文件
+    '.csv': read_csv_file,
+    
+    # Zip文件
+    '.zip': read_zip_file,
+}
+
+
+def get_file_handler(file_name, default=read_text_file):
+    """
+    根据文件名后缀返回对应的读取函数，不支持的类型返回 default
+    """
+    suffix = os.path.splitext(str(file_name))[1].lower()
+    return FILE_HANDLERS.get(suffix, default)
+
+
+# 支持大文件模式（接受 budget 参数）的读取函数
+# Word/PowerPoint 由所用库整体载入，压缩包已有独立的解压限制，不在此列
+LARGE_FILE_HANDLERS = {
+    read_text_file,
+    read_pdf_file,
+    read_excel_file,
+    read_xls_file,
+    read_csv_file,
+}
+
+# 可导出为列式数据文件的表格读取函数
+COLUMNAR_HANDLERS = {
+    read_excel_file,
+    read_xls_file,
+    read_csv_file,
+}
+
+
+def get_file_content(file_path, large_file_mode=None, columnar_dir=None):
     """
     根据文件类型选择合适的读取方法
+
+    参数:
+        file_path: 文件路径
+        large_file_mode: 是否使用大文件模式，None 表示文件超过
+            LARGE_FILE_THRESHOLD_BYTES 时自动启用
+        columnar_dir: 指定时表格文件的数据导出为该目录下的压缩列式文件，
+            返回内容只包含预览，见 utils.columnar_export.export_spreadsheet；
+            进入大文件模式的表格不导出，按大文件模式流式读取
     """
     file_path = Path(file_path)
     
@@ -388,53 +1104,81 @@ def get_file_content(file_path):
     if not is_safe:
         return message
 
-    suffix = file_path.suffix.lower()
-    
-    # 定义支持的文件类型
-    file_handlers = {
-        # 文本文件
-        '.txt': read_text_file,
-        '.py': read_text_file,
-        '.md': read_text_file,
-        '.json': read_text_file,
-        '.xml': read_text_file,
-        '.html': read_text_file,
-        '.css': read_text_file,
-        '.js': read_text_file,
-        '.log': read_text_file,
-        '.ini': read_text_file,
-        '.cfg': read_text_file,
-        '.conf': read_text_file,
-        
-        # Word文档
-        '.docx': read_docx_file,
-        
-        # PDF文件
-        '.pdf': read_pdf_file,
-        
-        # Excel文件 - 新版.xlsx
-        '.xlsx': read_excel_file,
-        # Excel文件 - 旧版.xls
-        '.xls': read_xls_file,
-        
-        # PowerPoint文件
-        '.pptx': read_powerpoint_file,
-        
-        # CSV文件
-        '.csv': read_csv_file,
-        
-        # Zip文件
-        '.zip': read_zip_file,
-    }
-    
-    handler = file_handlers.get(suffix)
-    if handler:
-        return handler(file_path)
-    else:
-        # 对于不支持的文件类型，尝试作为文本文件读取
-        return read_text_file(file_path)
+    # 对于不支持的文件类型，尝试作为文本文件读取
+    handler = get_file_handler(file_path)
+
+    if large_file_mode is None:
+        large_file_mode = os.path.getsize(file_path) > LARGE_FILE_THRESHOLD_BYTES
+    # 大文件模式优先：列式导出会把整个工作表载入内存，超大的表格改为流式读取并受内存预算限制
+    if large_file_mode and handler in LARGE_FILE_HANDLERS:
+        with MemoryBudget() as budget:
+            return handler(file_path, budget=budget)
+    if columnar_dir is not None and handler in COLUMNAR_HANDLERS:
+        return export_spreadsheet(file_path, columnar_dir)
+    return handler(file_path)
+
+# 读取函数输出中用于划分章节的标题：PDF页、工作表、幻灯片、压缩包成员
+_SECTION_HEADING = re.compile(r'^(?:### (第\d+页|工作表: .+|幻灯片 \d+)|## (压缩包成员: .+))$', re.MULTILINE)
+
 
-def read_all_files(directory=".", file_extensions=None, exclude_dirs=None):
+def iter_sections(content):
+    """
+    按读取函数输出的标题将内容划分为章节（页/工作表/幻灯片/压缩包成员）
+
+    参数:
+        content: get_file_content 返回的文本
+
+    返回:
+        生成器，产出 (章节名, 章节文本)；第一个标题之前的内容章节名为空字符串，
+        压缩包成员内部的章节名带有成员前缀，如 "压缩包成员: a.pdf / 第1页"，
+        嵌套压缩包的成员带有外层路径，如 "压缩包成员: inner.zip!a/doc.pdf / 第1页"
+    """
+    member = ""
+    section = ""
+    position = 0
+    for match in _SECTION_HEADING.finditer(content):
+        text = content[position:match.start()].strip()
+        if text:
+            yield section, text
+        if match.group(2):
+            member = match.group(2)
+            section = member
+        else:
+            section = f"{member} / {match.group(1)}" if member else match.group(1)
+        position = match.end()
+    text = content[position:].strip()
+    if text:
+        yield section, text
+
+
+# 默认排除的目录
+DEFAULT_EXCLUDE_DIRS = ['.git', '__pycache__', 'node_modules', '.venv', 'venv']
+
+# 支持的文件扩展名
+SUPPORTED_EXTENSIONS = frozenset(FILE_HANDLERS)
+
+
+def iter_supported_files(directory=".", file_extensions=None, exclude_dirs=None, **filters):
+    """
+    遍历目录下需要处理的文件，参数含义与 read_all_files 相同
+
+    参数:
+        filters: 传给 scan_files 的其他过滤条件，如 include、exclude、min_size、
+            max_size、modified_after、modified_before、symlinks、max_depth、scan_workers
+
+    返回:
+        生成器，产出文件路径 (Path)
+    """
+    if exclude_dirs is None:
+        exclude_dirs = DEFAULT_EXCLUDE_DIRS
+    # 如果没有指定扩展名，只处理支持的文件类型
+    extensions = file_extensions or SUPPORTED_EXTENSIONS
+
+    for entry in scan_files(directory, extensions, exclude_dirs, **filters):
+        yield Path(entry.path)
+
+
+def read_all_files(directory=".", file_extensions=None, exclude_dirs=None, extractor=None, workers=1, **filters):
     """
     读取目录下所有支持的文件内容
     
@@ -442,56 +1186,41 @@ def read_all_files(directory=".", file_extensions=None, exclude_dirs=None):
         directory: 要读取的目录路径，默认为当前目录
         file_extensions: 要读取的文件扩展名列表，如 ['.docx', '.pdf']，None表示读取所有支持的文件
         exclude_dirs: 要排除的目录名列表
+        extractor: 提取单个文件内容的函数，默认为 get_file_content；
+            可传入 SandboxedExtractor.get_file_content 在隔离进程中处理
+        workers: 并行提取的文件数，大于 1 时边扫描边提取，结果仍按扫描顺序排列
+        filters: 扫描过滤条件，见 utils.scanner.scan_files
     
     返回:
         包含所有文件内容的字典，键为文件路径，值为文件内容
     """
-    if exclude_dirs is None:
-        exclude_dirs = ['.git', '__pycache__', 'node_modules', '.venv', 'venv']
-    
+    if extractor is None:
+        extractor = get_file_content
+
     file_contents = {}
     directory_path = Path(directory)
     
     if not directory_path.exists():
         return {"错误": f"目录 {directory} 不存在"}
-    
-    # 支持的文件扩展名
-    supported_extensions = [
-        # 文本文件
-        '.txt', '.py', '.md', '.json', '.xml', '.html', '.css', '.js', 
-        '.log', '.ini', '.cfg', '.conf',
-        # Word文档
-        '.docx', 
-        # PDF文件
-        '.pdf',
-        # Excel文件 - 新版.xlsx和旧版.xls
-        '.xlsx', '.xls',
-        # PowerPoint文件
-        '.pptx',
-        # CSV文件
-        '.csv',
-        # Zip文件
-        '.zip',
-    ]
-    
-    for root, dirs, files in os.walk(directory):
-        # 排除指定的目录
-        dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        
-        for file in files:
-            file_path = Path(root) / file
-            suffix = file_path.suffix.lower()
-            
-            # 如果指定了文件扩展名，只读取匹配的文件
-            if file_extensions:
-                if suffix not in file_extensions:
-                    continue
-            elif suffix not in supported_extensions:
-                # 如果没有指定扩展名，只处理支持的文件类型
-                continue
-            
-            # 读取文件内容
-            content = get_file_content(file_path)
-            file_contents[str(file_path)] = content
+
+    file_paths = iter_supported_files(directory, file_extensions, exclude_dirs, **filters)
+    if workers > 1:
+        scanned = []
+
+        def record(paths):
+            for file_path in paths:
+                scanned.append(str(file_path))
+                yield file_path
+
+        finished = {}
+        for file_path, content in extract_as_scanned(record(file_paths), extractor, workers):
+            finished[str(file_path)] = content
+        # 按扫描顺序而不是完成顺序排列，每次运行的输出顺序一致
+        return {file_path: finished[file_path] for file_path in scanned}
+
+    for file_path in file_paths:
+        # 读取文件内容
+        content = extractor(file_path)
+        file_contents[str(file_path)] = content
     
     return file_contents
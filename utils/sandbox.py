@@ -0,0 +1,548 @@
+import multiprocessing
+import queue
+import signal
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，此时不设置内存上限，只保留超时与崩溃隔离
+    resource = None
+
+# 单个文件的处理超时时间 (秒)
+SANDBOX_TIMEOUT_SECONDS = 120
+# 工作进程的内存上限 (默认为 2 GB)，None 表示不限制
+SANDBOX_MEMORY_LIMIT_BYTES = 2 * 1024 * 1024 * 1024
+# 工作进程处理多少个文件后自动回收重建，避免内存碎片和泄漏累积
+SANDBOX_MAX_JOBS_PER_WORKER = 50
+# 工作进程启动（导入依赖库、预热）的超时时间 (秒)
+SANDBOX_START_TIMEOUT_SECONDS = 60
+
+# 常驻工作进程池的默认大小
+WORKER_POOL_SIZE = min(4, multiprocessing.cpu_count())
+# 常驻工作进程池健康检查的间隔与单次检查的超时 (秒)
+WORKER_POOL_HEALTH_INTERVAL_SECONDS = 30
+WORKER_POOL_PING_TIMEOUT_SECONDS = 5
+# 等待空闲工作进程的最长时间与检查进程池是否已关闭的间隔 (秒)；
+# 默认足够一个任务超时后被终止并完成替换，仍等不到说明替换的进程一直无法启动
+WORKER_POOL_ACQUIRE_TIMEOUT_SECONDS = SANDBOX_TIMEOUT_SECONDS + SANDBOX_START_TIMEOUT_SECONDS
+WORKER_POOL_ACQUIRE_POLL_SECONDS = 1
+# forkserver 预先导入的模块，之后派生的工作进程直接继承已导入的依赖库
+WORKER_POOL_PRELOAD = ['utils.file_utils', 'utils.sandbox']
+
+# PDF 预热时加载的中文 CMap，避免首个中文PDF请求承担加载开销
+_WARM_UP_CMAPS = ('UniGB-UCS2-H', 'UniGB-UTF16-H')
+_WARM_UP_UNICODE_MAPS = ('Adobe-GB1',)
+
+# 处理结果状态
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_OOM = "oom"
+STATUS_CRASHED = "crashed"
+STATUS_UNAVAILABLE = "unavailable"  # 进程池已关闭或等待超时，没有可用的工作进程
+
+# sys.monitoring 中未被标准工具占用的编号
+_MONITORING_TOOL_ID = 4
+
+# 主进程与工作进程之间的控制消息
+_MESSAGE_READY = "ready"
+_MESSAGE_PING = "ping"
+_MESSAGE_PONG = "pong"
+
+
+def _apply_memory_limit(memory_limit):
+    """
+    在工作进程中设置地址空间上限，超出后分配内存会抛出 MemoryError
+    """
+    if resource is None or memory_limit is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _watch_memory_errors():
+    """
+    记录处理过程中出现过的 MemoryError
+
+    各读取函数会捕获所有异常并返回错误文本，MemoryError 也不例外，
+    因此通过 sys.monitoring 的 RAISE 事件单独识别内存超限
+    """
+    state = {"oom": False}
+    monitoring = getattr(sys, "monitoring", None)
+    if monitoring is None:
+        return state
+
+    def on_raise(code, offset, exception):
+        if isinstance(exception, MemoryError):
+            state["oom"] = True
+
+    monitoring.use_tool_id(_MONITORING_TOOL_ID, "file-extraction-sandbox")
+    monitoring.register_callback(_MONITORING_TOOL_ID, monitoring.events.RAISE, on_raise)
+    monitoring.set_events(_MONITORING_TOOL_ID, monitoring.events.RAISE)
+    return state
+
+
+def _warm_up():
+    """
+    预先加载解析过程中延迟导入的依赖与字体映射表
+    """
+    try:
+        from pdfminer.cmapdb import CMapDB
+        for name in _WARM_UP_CMAPS:
+            CMapDB.get_cmap(name)
+        for name in _WARM_UP_UNICODE_MAPS:
+            CMapDB.get_unicode_map(name)
+    except Exception:
+        # 预热失败不影响正常处理，首次用到时再加载
+        pass
+
+
+def _worker_main(conn, memory_limit):
+    """
+    工作进程主循环：接收文件路径，提取内容后通过管道返回 (状态, 内容)
+    """
+    # 中断信号由主进程统一处理，工作进程随管道关闭退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _apply_memory_limit(memory_limit)
+    from utils.file_utils import get_file_content
+    _warm_up()
+
+    memory_errors = _watch_memory_errors()
+    conn.send(_MESSAGE_READY)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        if job == _MESSAGE_PING:
+            conn.send(_MESSAGE_PONG)
+            continue
+
+        file_path, options = job
+        memory_errors["oom"] = False
+        try:
+            content = get_file_content(file_path, **options)
+        except MemoryError:
+            memory_errors["oom"] = True
+            content = ""
+        except Exception as e:
+            conn.send((STATUS_ERROR, f"处理文件时发生错误: {str(e)}"))
+            continue
+
+        if not memory_errors["oom"]:
+            try:
+                conn.send((STATUS_OK, content))
+                continue
+            except MemoryError:
+                # 结果序列化时内存不足
+                pass
+        # 内存耗尽后进程状态不可靠，报告后退出等待回收
+        conn.send((STATUS_OOM, None))
+        break
+    conn.close()
+
+
+def get_worker_context(start_method=None):
+    """
+    返回创建工作进程的 multiprocessing 上下文
+
+    默认优先使用 forkserver 并预先导入依赖库，每个工作进程从已完成导入的
+    forkserver 派生；不支持 forkserver 的平台 (Windows) 使用 spawn
+    """
+    if start_method is None:
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(WORKER_POOL_PRELOAD)
+    return context
+
+
+class SandboxWorker:
+    """
+    单个隔离的工作进程，负责收发任务与强制终止
+    """
+    def __init__(self, context, memory_limit):
+        self.context = context
+        self.memory_limit = memory_limit
+        self.jobs = 0
+        self.ready = False
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def wait_ready(self, timeout=SANDBOX_START_TIMEOUT_SECONDS):
+        """
+        等待工作进程完成导入和预热，成功返回 True
+        """
+        if self.ready:
+            return True
+        try:
+            if self.conn.poll(timeout) and self.conn.recv() == _MESSAGE_READY:
+                self.ready = True
+        except (EOFError, OSError):
+            pass
+        return self.ready
+
+    def ping(self, timeout=WORKER_POOL_PING_TIMEOUT_SECONDS):
+        """
+        健康检查：工作进程在超时内响应返回 True
+        """
+        try:
+            self.conn.send(_MESSAGE_PING)
+            return self.conn.poll(timeout) and self.conn.recv() == _MESSAGE_PONG
+        except (EOFError, OSError):
+            return False
+
+    def run(self, file_path, options, timeout):
+        """
+        在工作进程中处理一个文件，返回 (状态, 内容)
+        """
+        if not self.wait_ready():
+            self.kill()
+            return STATUS_CRASHED, None
+
+        self.jobs += 1
+        try:
+            self.conn.send((str(file_path), options))
+            if not self.conn.poll(timeout):
+                self.kill()
+                return STATUS_TIMEOUT, None
+            return self.conn.recv()
+        except (EOFError, OSError):
+            # 工作进程异常退出：被 SIGKILL 终止通常意味着触发了系统 OOM Killer
+            self.process.join(5)
+            if self.process.exitcode == -signal.SIGKILL:
+                return STATUS_OOM, None
+            return STATUS_CRASHED, None
+
+    def extract(self, file_path, options, timeout):
+        """
+        处理一个文件并返回结果字典；超时、内存超限或崩溃时同时终止工作进程
+        """
+        started = time.monotonic()
+        status, content = self.run(file_path, options, timeout)
+        exitcode = None
+        if status not in (STATUS_OK, STATUS_ERROR):
+            self.stop()
+            exitcode = self.process.exitcode
+        return {
+            "status": status,
+            "content": content,
+            "elapsed": time.monotonic() - started,
+            "exitcode": exitcode,
+        }
+
+    def stop(self):
+        """
+        通知工作进程正常退出，超时未退出则强制终止
+        """
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(5)
+
+
+class SandboxedExtractor:
+    """
+    在隔离的工作进程中提取文件内容
+
+    每个文件都有墙钟超时和内存上限，处理异常的文件只会终止工作进程，
+    不会拖垮调用方；工作进程在处理 max_jobs_per_worker 个文件后自动重建。
+
+    用法:
+        with SandboxedExtractor(timeout=60) as extractor:
+            result = extractor.extract("a.pdf")
+            if result["status"] == "ok":
+                print(result["content"])
+    """
+    def __init__(self, timeout=None, memory_limit=None, max_jobs_per_worker=None, start_method="spawn"):
+        self.timeout = SANDBOX_TIMEOUT_SECONDS if timeout is None else timeout
+        self.memory_limit = SANDBOX_MEMORY_LIMIT_BYTES if memory_limit is None else memory_limit
+        self.max_jobs_per_worker = max_jobs_per_worker or SANDBOX_MAX_JOBS_PER_WORKER
+        self.context = multiprocessing.get_context(start_method)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _get_worker(self):
+        if self._worker is not None and (
+            not self._worker.is_alive() or self._worker.jobs >= self.max_jobs_per_worker
+        ):
+            self._worker.stop()
+            self._worker = None
+        if self._worker is None:
+            self._worker = SandboxWorker(self.context, self.memory_limit)
+        return self._worker
+
+    def extract(self, file_path, **options):
+        """
+        提取单个文件内容
+
+        参数:
+            file_path: 文件路径
+            options: 传给 get_file_content 的其他参数
+
+        返回:
+            字典，包含 status (ok/error/timeout/oom/crashed)、content、elapsed (秒)
+            以及工作进程被回收时的 exitcode
+        """
+        with self._lock:
+            result = self._get_worker().extract(file_path, options, self.timeout)
+            if result["exitcode"] is not None:
+                # 已终止的工作进程直接丢弃，下次调用时重建
+                self._worker = None
+            return result
+
+    def get_file_content(self, file_path, **options):
+        """
+        与 utils.file_utils.get_file_content 接口一致，异常情况返回说明文字
+        """
+        return format_sandbox_result(file_path, self.extract(file_path, **options), self.timeout, self.memory_limit)
+
+    def close(self):
+        with self._lock:
+            if self._worker is not None:
+                self._worker.stop()
+                self._worker = None
+
+
+class WarmWorkerPool:
+    """
+    常驻的预热工作进程池，供 HTTP 服务等长期运行的调用方使用
+
+    启动时预先创建 size 个工作进程并完成依赖导入与预热，请求到来时直接
+    分配空闲进程处理；每个进程处理 max_tasks_per_child 个文件后在后台替换，
+    后台线程定期对空闲进程做健康检查，无响应的进程会被替换。
+    隔离保证与 SandboxedExtractor 相同：超时、内存超限和崩溃只影响单个请求。
+
+    用法:
+        pool = WarmWorkerPool(size=4)
+        pool.start()
+        result = pool.extract("a.pdf")
+        pool.close()
+    """
+    def __init__(self, size=None, timeout=None, memory_limit=None, max_tasks_per_child=None,
+                 health_interval=None, start_method=None, acquire_timeout=None):
+        self.size = size or WORKER_POOL_SIZE
+        self.timeout = SANDBOX_TIMEOUT_SECONDS if timeout is None else timeout
+        self.acquire_timeout = WORKER_POOL_ACQUIRE_TIMEOUT_SECONDS if acquire_timeout is None else acquire_timeout
+        self.memory_limit = SANDBOX_MEMORY_LIMIT_BYTES if memory_limit is None else memory_limit
+        self.max_tasks_per_child = max_tasks_per_child or SANDBOX_MAX_JOBS_PER_WORKER
+        self.health_interval = health_interval or WORKER_POOL_HEALTH_INTERVAL_SECONDS
+        self.context = get_worker_context(start_method)
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._health_thread = None
+        self._stats = {"completed": 0, "recycled": 0, "replaced": 0, "unavailable": 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def start(self):
+        """
+        创建并预热所有工作进程，启动健康检查线程
+        """
+        workers = [self._spawn_worker() for _ in range(self.size)]
+        for worker in workers:
+            if worker.wait_ready():
+                self._idle.put(worker)
+            else:
+                self._discard(worker)
+                self._replace_in_background()
+        self._health_thread = threading.Thread(target=self._health_loop, name="worker-pool-health", daemon=True)
+        self._health_thread.start()
+
+    def _spawn_worker(self):
+        worker = SandboxWorker(self.context, self.memory_limit)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop()
+
+    def _replace(self):
+        """
+        创建一个新的工作进程替换被回收的进程，预热完成后才加入空闲队列
+        """
+        if self._closed.is_set():
+            return
+        worker = self._spawn_worker()
+        if worker.wait_ready() and not self._closed.is_set():
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+            if not self._closed.is_set():
+                self._replace_in_background()
+
+    def _replace_in_background(self):
+        threading.Thread(target=self._replace, name="worker-pool-replace", daemon=True).start()
+
+    def _release(self, worker, result=None):
+        """
+        任务完成后归还工作进程，需要回收的进程在后台替换，不阻塞当前请求
+        """
+        recycle = worker.jobs >= self.max_tasks_per_child
+        broken = not worker.is_alive() or (result is not None and result["exitcode"] is not None)
+        if self._closed.is_set():
+            self._discard(worker)
+        elif recycle or broken:
+            with self._lock:
+                self._stats["recycled" if recycle and not broken else "replaced"] += 1
+            self._discard(worker)
+            self._replace_in_background()
+        else:
+            self._idle.put(worker)
+
+    def extract(self, file_path, **options):
+        """
+        分配一个空闲工作进程提取文件内容，返回值与 SandboxedExtractor.extract 相同
+        """
+        if self._closed.is_set():
+            raise RuntimeError("工作进程池已关闭")
+        worker = self._acquire()
+        if worker is None:
+            with self._lock:
+                self._stats["unavailable"] += 1
+            return {"status": STATUS_UNAVAILABLE, "content": None, "elapsed": 0.0, "exitcode": None}
+        result = None
+        try:
+            result = worker.extract(file_path, options, self.timeout)
+            with self._lock:
+                self._stats["completed"] += 1
+            return result
+        finally:
+            self._release(worker, result)
+
+    def _acquire(self):
+        """
+        等待一个空闲工作进程；进程池关闭或超过 acquire_timeout 仍没有空闲进程时返回 None
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while not self._closed.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                worker = self._idle.get(timeout=min(remaining, WORKER_POOL_ACQUIRE_POLL_SECONDS))
+            except queue.Empty:
+                continue
+            if self._closed.is_set():
+                self._discard(worker)
+                return None
+            return worker
+        return None
+
+    def get_file_content(self, file_path, **options):
+        """
+        与 utils.file_utils.get_file_content 接口一致，异常情况返回说明文字
+        """
+        return format_sandbox_result(file_path, self.extract(file_path, **options), self.timeout, self.memory_limit)
+
+    def check_health(self):
+        """
+        对当前空闲的工作进程逐个发送心跳，无响应的进程被替换
+
+        返回:
+            本次被替换的进程数
+        """
+        checked = []
+        unhealthy = 0
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in checked:
+            if worker.is_alive() and worker.ping():
+                self._idle.put(worker)
+            else:
+                unhealthy += 1
+                with self._lock:
+                    self._stats["replaced"] += 1
+                self._discard(worker)
+                self._replace_in_background()
+        return unhealthy
+
+    def _health_loop(self):
+        while not self._closed.wait(self.health_interval):
+            self.check_health()
+
+    def stats(self):
+        """
+        返回进程池状态：总进程数、空闲数以及完成/回收/替换计数
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "workers": len(self._workers),
+                "idle": self._idle.qsize(),
+                **self._stats,
+            }
+
+    def close(self):
+        """
+        停止健康检查并关闭所有工作进程，正在处理的任务完成后其进程随即关闭；
+        仍在等待空闲进程的请求在 WORKER_POOL_ACQUIRE_POLL_SECONDS 内返回 unavailable 状态
+        """
+        self._closed.set()
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def format_sandbox_result(file_path, result, timeout, memory_limit):
+    """
+    将隔离处理的结果转换为文本，超时/内存超限/崩溃时返回说明
+    """
+    status = result["status"]
+    if status == STATUS_OK or status == STATUS_ERROR:
+        return result["content"]
+    if status == STATUS_TIMEOUT:
+        return f"处理文件超时 (超过 {timeout} 秒)，已终止: {file_path}"
+    if status == STATUS_OOM:
+        limit = f" ({memory_limit / 1024 / 1024:.0f} MB)" if memory_limit else ""
+        return f"处理文件时内存超出限制{limit}，已终止: {file_path}"
+    if status == STATUS_UNAVAILABLE:
+        return f"没有可用的工作进程 (进程池已关闭或工作进程无法启动)，未处理: {file_path}"
+    return f"处理文件时工作进程异常退出 (退出码 {result['exitcode']}): {file_path}"
@@ -0,0 +1,207 @@
+import fnmatch
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+# 并行扫描子目录的线程数，网络文件系统上 scandir/stat 的延迟可以相互重叠
+SCAN_WORKERS = 8
+# 预读中的目录数不超过扫描线程数的该倍数，避免产出较慢时预读结果无限堆积
+SCAN_PREFETCH_FACTOR = 2
+
+# 符号链接处理策略
+SYMLINKS_SKIP = "skip"      # 忽略所有符号链接
+SYMLINKS_FILES = "files"    # 读取指向文件的符号链接，不进入链接的目录（与 os.walk 默认行为一致）
+SYMLINKS_FOLLOW = "follow"  # 同时进入链接的目录，已访问过的目录不会重复扫描
+
+# 扫描结果：路径、文件大小、修改时间
+ScanEntry = namedtuple("ScanEntry", ["path", "size", "mtime"])
+
+
+def _timestamp(value):
+    """
+    将 datetime 或时间戳统一转换为时间戳
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise TypeError(f"不支持的时间类型: {type(value).__name__}")
+
+
+def _matches(relative_path, name, patterns):
+    """
+    glob 模式同时匹配相对路径（以 / 分隔）和文件名
+    """
+    return any(fnmatch.fnmatch(relative_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def scan_files(directory=".", file_extensions=None, exclude_dirs=None, include=None, exclude=None,
+               min_size=None, max_size=None, modified_after=None, modified_before=None,
+               symlinks=SYMLINKS_FILES, max_depth=None, scan_workers=SCAN_WORKERS):
+    """
+    使用 os.scandir 扫描目录，各子目录在线程池中并行预读，边扫描边产出结果
+
+    无论是否并行，结果都按深度优先、同一目录内按名称排序的固定顺序产出
+
+    参数:
+        directory: 要扫描的目录
+        file_extensions: 只保留这些扩展名（如 ['.pdf']，不区分大小写），None 表示不限制
+        exclude_dirs: 要跳过的目录名
+        include: glob 模式列表，文件的相对路径或文件名匹配任一模式才保留（* 也匹配 /）
+        exclude: glob 模式列表，匹配的文件和目录被跳过
+        min_size, max_size: 文件大小范围（字节）
+        modified_after, modified_before: 修改时间范围（时间戳或 datetime）
+        symlinks: 符号链接策略，SYMLINKS_SKIP / SYMLINKS_FILES / SYMLINKS_FOLLOW
+        max_depth: 最大深度，0 表示只扫描目录本身的文件，None 表示不限制
+        scan_workers: 并行扫描的线程数，1 表示在当前线程中逐个目录扫描
+
+    返回:
+        生成器，产出 ScanEntry(path, size, mtime)
+    """
+    root = os.fspath(directory)
+    prefix_length = len(os.path.join(root, ""))
+    extensions = frozenset(ext.lower() for ext in file_extensions) if file_extensions else None
+    exclude_dirs = frozenset(exclude_dirs or ())
+    after = _timestamp(modified_after)
+    before = _timestamp(modified_before)
+    # 跟随目录链接时记录已访问目录，防止链接成环；只在调用方线程中读写
+    visited = set()
+
+    def relative(path):
+        return path[prefix_length:].replace(os.sep, "/")
+
+    def scan_dir(path, depth):
+        entries = []
+        subdirs = []
+        try:
+            with os.scandir(path) as iterator:
+                # 按名称排序，输出顺序不依赖文件系统返回目录项的顺序
+                dir_entries = sorted(iterator, key=lambda e: e.name)
+        except OSError:
+            return entries, subdirs
+
+        for entry in dir_entries:
+            try:
+                is_link = entry.is_symlink()
+                if is_link and symlinks == SYMLINKS_SKIP:
+                    continue
+
+                if entry.is_dir():
+                    if is_link and symlinks != SYMLINKS_FOLLOW:
+                        continue
+                    if entry.name in exclude_dirs:
+                        continue
+                    if exclude and _matches(relative(entry.path), entry.name, exclude):
+                        continue
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    key = None
+                    if symlinks == SYMLINKS_FOLLOW:
+                        stat = entry.stat()
+                        key = (stat.st_dev, stat.st_ino)
+                    subdirs.append((entry.path, depth + 1, key))
+                    continue
+
+                if not entry.is_file():
+                    continue
+                if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                if include or exclude:
+                    relative_path = relative(entry.path)
+                    if include and not _matches(relative_path, entry.name, include):
+                        continue
+                    if exclude and _matches(relative_path, entry.name, exclude):
+                        continue
+
+                stat = entry.stat()
+                if min_size is not None and stat.st_size < min_size:
+                    continue
+                if max_size is not None and stat.st_size > max_size:
+                    continue
+                if after is not None and stat.st_mtime < after:
+                    continue
+                if before is not None and stat.st_mtime > before:
+                    continue
+                entries.append(ScanEntry(entry.path, stat.st_size, stat.st_mtime))
+            except OSError:
+                # 扫描过程中被删除或无权限访问的条目直接跳过
+                continue
+        return entries, subdirs
+
+    def unvisited(subdirs):
+        # 在调用方线程中按产出顺序检查，已访问的目录（链接成环或重复链接）不再扫描
+        result = []
+        for path, depth, key in subdirs:
+            if key is not None:
+                if key in visited:
+                    continue
+                visited.add(key)
+            result.append((path, depth))
+        return result
+
+    if symlinks == SYMLINKS_FOLLOW:
+        stat = os.stat(root)
+        visited.add((stat.st_dev, stat.st_ino))
+
+    if scan_workers is None or scan_workers <= 1:
+        stack = [(root, 0)]
+        while stack:
+            entries, subdirs = scan_dir(*stack.pop())
+            yield from entries
+            stack.extend(reversed(unvisited(subdirs)))
+        return
+
+    # 栈中每项为 [路径, 深度, Future]，Future 为 None 表示尚未提交；
+    # 从栈顶（即将产出的目录）开始预读，同时预读的目录数有上限
+    max_pending = scan_workers * SCAN_PREFETCH_FACTOR
+    with ThreadPoolExecutor(max_workers=scan_workers, thread_name_prefix="scan") as executor:
+        stack = [[root, 0, None]]
+        pending = 0
+        try:
+            while stack:
+                for item in reversed(stack):
+                    if pending >= max_pending:
+                        break
+                    if item[2] is None:
+                        item[2] = executor.submit(scan_dir, item[0], item[1])
+                        pending += 1
+                _, _, future = stack.pop()
+                pending -= 1
+                entries, subdirs = future.result()
+                yield from entries
+                stack.extend([path, depth, None] for path, depth in reversed(unvisited(subdirs)))
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的扫描
+            for _, _, future in stack:
+                if future is not None:
+                    future.cancel()
+
+
+def extract_as_scanned(paths, extractor, workers):
+    """
+    在扫描的同时提取文件内容：路径一产出就提交到线程池，扫描与解析相互重叠
+
+    同时在处理中的文件数不超过 workers 的两倍，避免扫描远快于解析时结果堆积
+
+    参数:
+        paths: 文件路径的可迭代对象（通常为扫描生成器）
+        extractor: 提取单个文件内容的函数
+        workers: 并行提取的线程数；extractor 为工作进程池时即为并发任务数
+
+    返回:
+        生成器，按完成顺序产出 (路径, 内容)
+    """
+    max_pending = max(workers, 1) * 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract") as executor:
+        pending = {}
+        for path in paths:
+            pending[executor.submit(extractor, path)] = path
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
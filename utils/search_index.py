@@ -0,0 +1,278 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.file_utils import get_file_content, iter_sections, iter_supported_files
+
+# 默认的索引数据库路径
+SEARCH_INDEX_PATH = "search_index.db"
+# 少于3个字符的查询无法使用 trigram 索引，改用单字/双字词表（short_terms）检索
+_TRIGRAM_MIN_QUERY_CHARS = 3
+# 构成短词的字符：字母、数字和汉字（与 unicode61 分词器的词字符一致，不含下划线）
+_SHORT_TERM_RUN = re.compile(r'[^\W_]+')
+
+
+def _short_terms(text):
+    """
+    提取文本中出现过的所有单字和相邻双字，去重后以空格连接，供 short_terms 表按词匹配
+    """
+    terms = set()
+    for run in _SHORT_TERM_RUN.findall(text.lower()):
+        terms.update(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return " ".join(terms)
+
+
+def _trigram_supported(conn):
+    """
+    检查 SQLite 是否支持 trigram 分词器（3.34 起提供），中文没有空格分词，需要按子串匹配
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _file_key(path):
+    """
+    磁盘文件在索引中的标识：统一为绝对路径，以相对路径和绝对路径索引同一文件时不会重复
+    """
+    return os.path.abspath(os.fspath(path))
+
+
+class SearchIndex:
+    """
+    基于 SQLite FTS5 的本地全文索引，按页/工作表/幻灯片存储提取后的文本
+
+    用法:
+        with SearchIndex("search_index.db") as index:
+            index.update_directory("docs")
+            for hit in index.search("销售数据"):
+                print(hit["path"], hit["section"], hit["snippet"])
+    """
+    def __init__(self, db_path=SEARCH_INDEX_PATH):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        # HTTP 服务在线程池中调用，连接由锁保护后跨线程共享
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.trigram = _trigram_supported(self._conn)
+        tokenizer = "trigram" if self.trigram else "unicode61"
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, indexed_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5("
+                f"path UNINDEXED, section UNINDEXED, content, tokenize='{tokenizer}')"
+            )
+            # FTS5 的 UNINDEXED 列不能建索引，按 path 删除会扫描整张表；
+            # 用普通表记录每个文件在 sections 中的 rowid，更新和删除时按 rowid 定位
+            created = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'section_rows'"
+            ).fetchone() is None
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS section_rows (id INTEGER PRIMARY KEY, path TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS section_rows_path ON section_rows (path)")
+            if created:
+                # 旧版本建立的索引没有该表，扫描一次补齐
+                self._conn.execute("INSERT INTO section_rows (id, path) SELECT rowid, path FROM sections")
+            if self.trigram:
+                # 1~2 个字符的查询（如常见的双字中文词）无法使用 trigram 索引，
+                # 另存每个章节的单字/双字词表，rowid 与 sections 相同
+                created = self._conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'short_terms'"
+                ).fetchone() is None
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS short_terms USING fts5(terms, tokenize='unicode61')"
+                )
+                if created:
+                    self._conn.executemany(
+                        "INSERT INTO short_terms (rowid, terms) VALUES (?, ?)",
+                        ((rowid, _short_terms(content))
+                         for rowid, content in self._conn.execute("SELECT rowid, content FROM sections").fetchall()),
+                    )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_document(self, path, content, size=None, mtime=None):
+        """
+        写入（或替换）一个文件的提取结果
+
+        参数:
+            path: 文件路径或上传文件名，作为索引中的唯一标识；
+                update_file 等方法写入磁盘文件时已转换为绝对路径
+            content: get_file_content 返回的文本
+            size, mtime: 文件大小与修改时间，用于判断是否需要重新索引
+        """
+        path = str(path)
+        rows = [(path, section, text) for section, text in iter_sections(str(content))]
+        with self._lock, self._conn:
+            self._delete_sections(path)
+            for row in rows:
+                rowid = self._conn.execute(
+                    "INSERT INTO sections (path, section, content) VALUES (?, ?, ?)", row
+                ).lastrowid
+                self._conn.execute("INSERT INTO section_rows (id, path) VALUES (?, ?)", (rowid, path))
+                if self.trigram:
+                    self._conn.execute(
+                        "INSERT INTO short_terms (rowid, terms) VALUES (?, ?)", (rowid, _short_terms(row[2]))
+                    )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, indexed_at) VALUES (?, ?, ?, ?)",
+                (path, size, mtime, time.time()),
+            )
+
+    def remove(self, path):
+        """
+        从索引中删除一个文件；按原样找不到时按绝对路径查找（磁盘文件以绝对路径索引）
+        """
+        path = str(path)
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM files WHERE path = ?", (path,)).fetchone() is None:
+                path = _file_key(path)
+            self._delete_sections(path)
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _delete_sections(self, path):
+        """
+        按 rowid 删除一个文件的所有章节，调用方需持有锁并处于事务中
+        """
+        rowids = self._conn.execute("SELECT id FROM section_rows WHERE path = ?", (path,)).fetchall()
+        self._conn.executemany("DELETE FROM sections WHERE rowid = ?", rowids)
+        if self.trigram:
+            self._conn.executemany("DELETE FROM short_terms WHERE rowid = ?", rowids)
+        self._conn.execute("DELETE FROM section_rows WHERE path = ?", (path,))
+
+    def needs_update(self, path):
+        """
+        文件未被索引，或大小/修改时间与索引时不同，返回 True
+        """
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime FROM files WHERE path = ?", (_file_key(path),)).fetchone()
+        return row is None or row[0] != stat.st_size or row[1] != stat.st_mtime
+
+    def update_file(self, path, extractor=None):
+        """
+        增量更新单个文件：内容未变化时跳过
+
+        返回:
+            是否重新提取并写入了索引
+        """
+        if not self.needs_update(path):
+            return False
+        extractor = extractor or get_file_content
+        stat = os.stat(path)
+        self.add_document(_file_key(path), extractor(path), size=stat.st_size, mtime=stat.st_mtime)
+        return True
+
+    def update_directory(self, directory=".", file_extensions=None, exclude_dirs=None, extractor=None):
+        """
+        增量更新目录：只重新提取新增或修改过的文件，并删除磁盘上已不存在的文件
+
+        返回:
+            字典，包含 updated（重新索引数）、skipped（未变化数）和 removed（删除数）
+        """
+        stats = {"updated": 0, "skipped": 0, "removed": 0}
+        seen = set()
+        for file_path in iter_supported_files(directory, file_extensions, exclude_dirs):
+            seen.add(_file_key(file_path))
+            if self.update_file(file_path, extractor):
+                stats["updated"] += 1
+            else:
+                stats["skipped"] += 1
+
+        # 只清理来自磁盘文件（记录了修改时间）且位于该目录下的条目，上传内容不受影响
+        prefix = os.path.join(os.path.abspath(directory), "")
+        with self._lock:
+            indexed = [row[0] for row in self._conn.execute("SELECT path FROM files WHERE mtime IS NOT NULL")]
+        for path in indexed:
+            if path in seen or not _file_key(path).startswith(prefix):
+                continue
+            # 旧版本以相对路径写入的条目，文件仍存在时也已按绝对路径重新索引，一并删除
+            if not os.path.exists(path) or _file_key(path) in seen:
+                self.remove(path)
+                stats["removed"] += 1
+        return stats
+
+    def index_results(self, file_contents):
+        """
+        将 read_all_files 的返回结果写入索引
+        """
+        for path, content in file_contents.items():
+            try:
+                stat = os.stat(path)
+                self.add_document(_file_key(path), content, size=stat.st_size, mtime=stat.st_mtime)
+            except OSError:
+                self.add_document(path, content)
+
+    def search(self, query, limit=20):
+        """
+        全文检索
+
+        参数:
+            query: 查询文本，按子串匹配；1~2 个字符的查询通过单字/双字词表检索，
+                含标点或空格的短查询没有索引可用，退化为 LIKE 扫描
+            limit: 最多返回的结果数
+
+        返回:
+            结果列表，每项包含 path、section、snippet 和 score（越小越相关）
+        """
+        query = query.strip()
+        if not query:
+            return []
+        with self._lock:
+            if self.trigram and len(query) < _TRIGRAM_MIN_QUERY_CHARS and _SHORT_TERM_RUN.fullmatch(query):
+                # 短查询不能使用 trigram 索引，在单字/双字词表中按词匹配
+                rows = self._conn.execute(
+                    "SELECT s.path, s.section, substr(s.content, max(instr(lower(s.content), ?) - 30, 1), 80), "
+                    "bm25(short_terms) FROM short_terms JOIN sections s ON s.rowid = short_terms.rowid "
+                    "WHERE short_terms MATCH ? ORDER BY bm25(short_terms) LIMIT ?",
+                    (query.lower(), f'"{query.lower()}"', limit),
+                ).fetchall()
+            elif self.trigram and len(query) < _TRIGRAM_MIN_QUERY_CHARS:
+                # 含标点或空格的短查询没有索引可用，LIKE 子串扫描，找到 limit 条即停止
+                escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                rows = self._conn.execute(
+                    "SELECT path, section, substr(content, max(instr(content, ?) - 30, 1), 80), 0 "
+                    "FROM sections WHERE content LIKE ? ESCAPE '\\' LIMIT ?",
+                    (query, f"%{escaped}%", limit),
+                ).fetchall()
+            else:
+                # 整个查询作为短语匹配，双引号需要转义
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = self._conn.execute(
+                    "SELECT path, section, snippet(sections, 2, '[', ']', '...', 16), bm25(sections) "
+                    "FROM sections WHERE sections MATCH ? ORDER BY bm25(sections) LIMIT ?",
+                    (phrase, limit),
+                ).fetchall()
+        return [
+            {"path": path, "section": section, "snippet": snippet, "score": score}
+            for path, section, snippet, score in rows
+        ]
+
+    def stats(self):
+        """
+        返回已索引的文件数和章节数
+        """
+        with self._lock:
+            files = self._conn.execute("SELECT count(*) FROM files").fetchone()[0]
+            sections = self._conn.execute("SELECT count(*) FROM sections").fetchone()[0]
+        return {"files": files, "sections": sections}
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """
+    一次进行中的调用，等待者在 event 上等待结果
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一 key 同时只执行一次，其余调用等待并共享这次的结果
+
+    调用结束后立即从表中移除，不缓存结果；之后的调用会重新执行。
+
+    用法:
+        flight = SingleFlight()
+        content, shared = flight.do(url, download_and_extract, url)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        执行 func(*args, **kwargs)，同一 key 已有调用在进行时等待其结果
+
+        返回:
+            (结果, 是否共享了其他调用的结果)；执行出错时所有等待者抛出同一个异常
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "executed": self.executed, "coalesced": self.coalesced}
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight 的 asyncio 版本，只在单个事件循环中使用
+
+    共享的调用在独立的任务中执行：某个请求被取消（例如客户端断开）不会取消这次调用，
+    其他等待者仍能拿到结果。
+    """
+    def __init__(self):
+        self._tasks = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        执行协程函数 func(*args, **kwargs)，同一 key 已有调用在进行时等待其结果
+
+        返回:
+            (结果, 是否共享了其他调用的结果)
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def running(self, key):
+        """
+        该 key 当前是否有调用在进行；与随后的 do 之间没有 await 时结果可靠
+        """
+        return key in self._tasks
+
+    def _finish(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 所有等待者都已取消时，由这里取走异常，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {"in_flight": len(self._tasks), "executed": self.executed, "coalesced": self.coalesced}
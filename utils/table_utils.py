@@ -0,0 +1,169 @@
+import io
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    # 没有 numpy 时按单元格逐个转换，列宽逐行计算
+    np = None
+
+
+def format_cell(value):
+    """
+    将单元格的值转换为 Markdown 表格中的文本
+
+    空值（None/NaN）输出为空字符串，整数值的浮点数去掉多余的 .0，
+    竖线转义为 \\|，换行替换为 <br>
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer() and abs(value) < 2 ** 53:
+            return str(int(value))
+        return str(value)
+    text = str(value).strip()
+    if "|" in text:
+        text = text.replace("|", "\\|")
+    if "\n" in text or "\r" in text:
+        text = text.replace("\r\n", "<br>").replace("\n", "<br>").replace("\r", "<br>")
+    return text
+
+
+def markdown_row(cells):
+    """
+    将已转换好的单元格文本拼接为一行 Markdown 表格
+    """
+    return "| " + " | ".join(cells) + " |"
+
+
+def _column_strings(values):
+    """
+    将一列值转换为单元格文本列表，数值列使用 numpy 整列转换
+    """
+    if np is not None and isinstance(values, np.ndarray) and values.dtype.kind in "iub":
+        return values.astype(str).tolist()
+    if np is not None and isinstance(values, np.ndarray) and values.dtype.kind == "f":
+        text = values.astype(str)
+        missing = np.isnan(values)
+        integral = ~missing & (np.trunc(values) == values) & (np.abs(values) < 2 ** 53)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+        text[missing] = ""
+        return text.tolist()
+    return [format_cell(value) for value in values]
+
+
+def _column_values(series):
+    """
+    取出 DataFrame 一列的值；日期时间和时间间隔列转换为 pandas 对象，
+    输出为 2024-01-01 00:00:00 和 1 days 00:00:00，而不是 numpy 的 ISO 格式
+    """
+    if series.dtype.kind in "Mm":
+        return series.astype(object).to_numpy()
+    return series.to_numpy()
+
+
+def _column_widths(header_cells, rows):
+    """
+    计算每列的最大文本宽度（含表头），有 numpy 时对整个表格向量化计算
+    """
+    if np is not None and rows:
+        lengths = np.char.str_len(np.asarray([header_cells, *rows], dtype=str))
+        widths = lengths.max(axis=0).tolist()
+    else:
+        widths = [len(cell) for cell in header_cells]
+        for row in rows:
+            widths = [max(width, len(cell)) for width, cell in zip(widths, row)]
+    # 分隔线至少需要3个短横线
+    return [max(width, 3) for width in widths]
+
+
+def _write_table(out, header_cells, rows, header=True, continuation=False, align=False):
+    """
+    写出 Markdown 表格，header_cells 与 rows 中的单元格均已转换并补齐
+    """
+    col_count = len(header_cells)
+    if col_count == 0:
+        return
+    if not header:
+        header_cells = [""] * col_count
+
+    if align:
+        widths = _column_widths(header_cells, rows)
+        header_cells = [cell.ljust(width) for cell, width in zip(header_cells, widths)]
+        rows = [[cell.ljust(width) for cell, width in zip(row, widths)] for row in rows]
+        separator = ["-" * width for width in widths]
+    else:
+        separator = ["---"] * col_count
+
+    write = out.write
+    if not continuation:
+        write(markdown_row(header_cells))
+        write("\n")
+        write(markdown_row(separator))
+        write("\n")
+    for row in rows:
+        write("| ")
+        write(" | ".join(row))
+        write(" |\n")
+
+
+def write_markdown_table(rows, out, header=True, continuation=False, align=False):
+    """
+    将二维数据写为 Markdown 表格，写入可复用的文本缓冲区
+
+    参数:
+        rows: 行的列表，每行为单元格值的序列，行长度可以不一致
+        out: 可写入的文本缓冲区（如 io.StringIO），每行以换行结尾
+        header: True 表示第一行作为表头；False 表示全部为数据行，输出空表头
+        continuation: True 表示接续已写出的表格，全部为数据行且不输出表头和分隔线
+        align: 是否按列宽补齐空格，使表格在纯文本中对齐
+    """
+    rows = list(rows)
+    col_count = max((len(row) for row in rows), default=0)
+    if col_count == 0:
+        return
+
+    # 单遍完成转换、转义与补齐
+    padding = [""] * col_count
+    cells = [[format_cell(value) for value in row] + padding[len(row):] for row in rows]
+    if header and not continuation:
+        header_cells, cells = cells[0], cells[1:]
+    else:
+        header_cells = padding
+    _write_table(out, header_cells, cells, header, continuation, align)
+
+
+def write_dataframe_table(df, out, header=True, continuation=False, align=False):
+    """
+    将 DataFrame 写为 Markdown 表格（不含索引），按列向量化转换单元格
+
+    参数:
+        df: pandas DataFrame
+        out: 可写入的文本缓冲区
+        header: True 表示列名作为表头；False 表示输出空表头
+        continuation: True 表示接续已写出的表格，不输出表头和分隔线
+        align: 是否按列宽补齐空格
+    """
+    header_cells = [format_cell(name) for name in df.columns]
+    columns = [_column_strings(_column_values(df.iloc[:, i])) for i in range(df.shape[1])]
+    _write_table(out, header_cells, list(zip(*columns)), header, continuation, align)
+
+
+def render_markdown_table(rows, header=True, align=False):
+    """
+    将二维数据渲染为 Markdown 表格字符串，参数见 write_markdown_table
+    """
+    out = io.StringIO()
+    write_markdown_table(rows, out, header=header, align=align)
+    return out.getvalue().rstrip("\n")
+
+
+def render_dataframe(df, header=True, align=False):
+    """
+    将 DataFrame 渲染为 Markdown 表格字符串，参数见 write_dataframe_table
+    """
+    out = io.StringIO()
+    write_dataframe_table(df, out, header=header, align=align)
+    return out.getvalue().rstrip("\n")
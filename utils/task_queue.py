@@ -0,0 +1,282 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from utils.file_utils import get_file_content
+
+# 租约时长 (秒)：工作进程在此时间内没有续约，任务重新回到待处理状态
+TASK_LEASE_SECONDS = 300
+# 工作进程续约的间隔 (秒)，应明显小于租约时长
+TASK_HEARTBEAT_SECONDS = 60
+# 单个任务最多被领取的次数，租约反复过期（例如文件导致工作进程崩溃）后标记为失败
+TASK_MAX_ATTEMPTS = 3
+# 队列暂无可领取任务但仍有任务处理中时，工作进程等待的间隔 (秒)
+TASK_POLL_SECONDS = 2
+# 数据库被其他进程锁定时等待的时间 (毫秒)
+TASK_BUSY_TIMEOUT_MS = 30000
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+
+def default_worker_id():
+    """
+    工作进程标识：主机名:进程号，多台机器共享同一队列时可以区分
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TaskQueue:
+    """
+    基于 SQLite 的文件提取任务队列，数据库放在共享文件系统上即可供多台机器使用
+
+    协调者 enqueue 文件路径；工作进程 lease 领取任务并定期 heartbeat 续约，
+    完成后 complete 写回结果。工作进程崩溃后租约到期，任务自动回到待处理状态。
+    所有状态变更都在 BEGIN IMMEDIATE 事务中完成，同一任务不会被两个工作进程同时持有。
+
+    用法:
+        with TaskQueue("tasks.db") as tasks:
+            tasks.enqueue(iter_supported_files("docs"))
+        run_worker("tasks.db")
+    """
+    def __init__(self, db_path, lease_seconds=TASK_LEASE_SECONDS, max_attempts=TASK_MAX_ATTEMPTS):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 手动管理事务；工作进程的续约线程独占自己的队列对象，连接允许在创建它的线程之外使用
+        self._conn = sqlite3.connect(
+            self.db_path, timeout=TASK_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False,
+        )
+        self._conn.execute(f"PRAGMA busy_timeout={TASK_BUSY_TIMEOUT_MS}")
+        # WAL 依赖共享内存，在网络文件系统上跨主机不可用，使用默认的回滚日志
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, status TEXT NOT NULL, "
+            "worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, error TEXT, updated_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self._conn.close()
+
+    def _transaction(self, func, *args):
+        """
+        在 BEGIN IMMEDIATE 事务中执行 func，立即取得写锁，避免多个工作进程读到同一任务
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return result
+
+    def enqueue(self, paths):
+        """
+        加入文件任务，已在队列中的路径不会重复加入
+
+        参数:
+            paths: 文件路径的可迭代对象，统一转换为绝对路径，其他主机需在相同路径挂载共享目录
+
+        返回:
+            新加入的任务数
+        """
+        now = time.time()
+        rows = [(os.path.abspath(path), TASK_PENDING, now) for path in paths]
+
+        def insert():
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO tasks (path, status, updated_at) VALUES (?, ?, ?)", rows)
+            return self._conn.total_changes - before
+
+        return self._transaction(insert)
+
+    def _expire_leases(self, now):
+        """
+        回收过期的租约：未达到最大领取次数的任务重新待处理，否则标记为失败
+        """
+        self._conn.execute(
+            "UPDATE tasks SET status = ?, error = '租约多次过期，工作进程可能在处理该文件时崩溃', "
+            "worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (TASK_FAILED, now, TASK_LEASED, now, self.max_attempts),
+        )
+        return self._conn.execute(
+            "UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires < ?",
+            (TASK_PENDING, now, TASK_LEASED, now),
+        ).rowcount
+
+    def expire_leases(self):
+        """
+        回收过期的租约，返回重新待处理的任务数
+        """
+        return self._transaction(self._expire_leases, time.time())
+
+    def lease(self, worker_id):
+        """
+        领取一个待处理任务
+
+        返回:
+            (任务ID, 文件路径)，没有可领取的任务时返回 None
+        """
+        def take():
+            now = time.time()
+            self._expire_leases(now)
+            rows = self._conn.execute(
+                "UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = (SELECT id FROM tasks WHERE status = ? ORDER BY id LIMIT 1) "
+                "RETURNING id, path",
+                (TASK_LEASED, worker_id, now + self.lease_seconds, now, TASK_PENDING),
+            ).fetchall()
+            # 提交前必须读完 RETURNING 的结果
+            return rows[0] if rows else None
+
+        return self._transaction(take)
+
+    def _update_owned(self, task_id, worker_id, sql, params):
+        """
+        只有租约仍由该工作进程持有时才更新，租约过期后被其他进程领取的任务不会被覆盖
+        """
+        def update():
+            return self._conn.execute(
+                f"UPDATE tasks SET {sql}, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (*params, time.time(), task_id, worker_id, TASK_LEASED),
+            ).rowcount == 1
+
+        return self._transaction(update)
+
+    def heartbeat(self, task_id, worker_id):
+        """
+        续约，返回租约是否仍由该工作进程持有
+        """
+        return self._update_owned(task_id, worker_id, "lease_expires = ?", (time.time() + self.lease_seconds,))
+
+    def complete(self, task_id, worker_id, content):
+        """
+        写回提取结果，返回是否写入成功（租约已失去时返回 False）
+        """
+        return self._update_owned(
+            task_id, worker_id, "status = ?, result = ?, error = NULL, lease_expires = NULL",
+            (TASK_DONE, content),
+        )
+
+    def fail(self, task_id, worker_id, error):
+        """
+        记录提取失败：未达到最大领取次数时重新待处理，否则标记为失败
+        """
+        def update():
+            return self._conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (self.max_attempts, TASK_FAILED, TASK_PENDING, str(error), time.time(),
+                 task_id, worker_id, TASK_LEASED),
+            ).rowcount == 1
+
+        return self._transaction(update)
+
+    def stats(self):
+        """
+        返回各状态的任务数
+        """
+        counts = {TASK_PENDING: 0, TASK_LEASED: 0, TASK_DONE: 0, TASK_FAILED: 0}
+        for status, count in self._conn.execute("SELECT status, count(*) FROM tasks GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def results(self):
+        """
+        逐条产出已完成任务的 (文件路径, 内容)，以及失败任务的 (文件路径, 错误信息)
+        """
+        for path, status, result, error in self._conn.execute(
+            "SELECT path, status, result, error FROM tasks WHERE status IN (?, ?) ORDER BY id",
+            (TASK_DONE, TASK_FAILED),
+        ):
+            yield path, result if status == TASK_DONE else f"提取文件 {path} 失败: {error}"
+
+
+def _heartbeat_loop(tasks, task_id, worker_id, stop, interval):
+    """
+    提取进行中定期续约，租约已失去时停止
+    """
+    while not stop.wait(interval):
+        try:
+            if not tasks.heartbeat(task_id, worker_id):
+                return
+        except sqlite3.Error:
+            # 数据库暂时不可用时等待下次续约，租约时长远大于续约间隔
+            continue
+
+
+def run_worker(db_path, worker_id=None, extractor=None, lease_seconds=TASK_LEASE_SECONDS,
+               heartbeat_seconds=TASK_HEARTBEAT_SECONDS, poll_seconds=TASK_POLL_SECONDS, exit_when_empty=True):
+    """
+    工作进程主循环：领取任务、提取、写回结果
+
+    参数:
+        db_path: 队列数据库路径
+        worker_id: 工作进程标识，默认为 主机名:进程号
+        extractor: 提取单个文件内容的函数，默认为 get_file_content
+        lease_seconds: 租约时长
+        heartbeat_seconds: 续约间隔
+        poll_seconds: 暂无可领取任务时的等待间隔
+        exit_when_empty: 队列中没有待处理和处理中的任务时是否退出
+
+    返回:
+        统计字典：completed（完成数）、failed（出错数）、lost（租约失去导致结果被丢弃的数目）
+    """
+    worker_id = worker_id or default_worker_id()
+    extractor = extractor or get_file_content
+    stats = {"completed": 0, "failed": 0, "lost": 0}
+
+    # 续约线程使用独立的连接，与主循环的事务互不干扰
+    with TaskQueue(db_path, lease_seconds) as tasks, TaskQueue(db_path, lease_seconds) as heartbeat_tasks:
+        while True:
+            task = tasks.lease(worker_id)
+            if task is None:
+                counts = tasks.stats()
+                if exit_when_empty and counts[TASK_PENDING] == 0 and counts[TASK_LEASED] == 0:
+                    return stats
+                # 其他工作进程仍在处理，等待可能过期的租约
+                time.sleep(poll_seconds)
+                continue
+
+            task_id, path = task
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=_heartbeat_loop,
+                args=(heartbeat_tasks, task_id, worker_id, stop, heartbeat_seconds),
+                daemon=True,
+            )
+            heartbeat.start()
+            try:
+                content = extractor(path)
+            except Exception as e:
+                stop.set()
+                heartbeat.join()
+                tasks.fail(task_id, worker_id, e)
+                stats["failed"] += 1
+                continue
+            stop.set()
+            heartbeat.join()
+
+            if tasks.complete(task_id, worker_id, content):
+                stats["completed"] += 1
+            else:
+                stats["lost"] += 1